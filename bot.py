@@ -3,30 +3,58 @@ from __future__ import annotations
 import asyncio
 import asyncio.mixins
 import collections
+import importlib
+import json
 import logging
 from logging.handlers import RotatingFileHandler
 import re
 import os
 import time
 import toml
+import uuid
 import yarl
-from typing import TypedDict, TYPE_CHECKING
+from typing import Awaitable, Callable, TypedDict, TYPE_CHECKING
 
 import aiohttp
-from slack_bolt.app.async_app import AsyncApp
-from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 
+import codec
 import config_example
+from catalog import PropCatalog
+from dashboard import Dashboard
+from failover import LeaseFailover
+from history import PageHistory
+from ingress import EventsApiReceiver
+from monitor import LoopMonitor
+from recorder import TraceRecorder
+from slack_cache import SlackMetadataCache, METADATA_EVENTS
 
 # region: types
 
 if TYPE_CHECKING:
+    from slack_bolt.app.async_app import AsyncApp
+    from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+    from slack_sdk.web.async_client import AsyncWebClient
     from ui.mainwindow import MainWindow
 
 class Channel(TypedDict):
     name: str
     id: str
 
+# propresenter actions -> the Client method that handles them
+PROP_ACTIONS = {
+    "authenticate": "prop_on_authenticate",
+    "messageHide": "prop_on_message_hide",
+    "messageSend": "prop_on_message_send",
+    "messageRequest": "prop_on_message_request",
+    "presentationTriggerIndex": None, # ignored
+}
+
+# payloads that never change, encoded once
+MESSAGE_REQUEST = codec.Frame({"action": "messageRequest"})
+MESSAGE_HIDE = codec.Frame({"action": "messageHide", "index": 0})
+
+STARTED = time.perf_counter() # roughly process start, main.py imports bot before anything else (including qt)
+
 # region: logging
 
 logger = logging.getLogger("bot")
@@ -42,6 +70,8 @@ logging.getLogger("root").setLevel(logging.INFO)
 home = os.environ["HOME"]
 os.makedirs(home + "/Documents/Village Kids Pager", exist_ok=True)
 
+TOKEN_CACHE = home + "/Documents/Village Kids Pager/.token-cache.json"
+
 handler = RotatingFileHandler(home + "/Documents/Village Kids Pager/app-log.log", backupCount=3, maxBytes=100000)
 handler.setFormatter(formatter)
 handler.setLevel(logging.DEBUG)
@@ -103,25 +133,99 @@ class DoubleEvent(asyncio.Event):
                     fut.set_result(True)
 
 
-class Client(AsyncApp):
+class Client:
     def __init__(self) -> None:
+        self.window: MainWindow | None = None # None when running headless
+        self.config: dict = None  # type: ignore # set by run(), stays None when the config couldn't be read
+
+        # slack_bolt is slow to import, so the app is only built once start() has kicked off everything else
+        self.app: AsyncApp | None = None
+        self.client: AsyncWebClient = None  # type: ignore
+        self.handler: AsyncSocketModeHandler | None = None
+        self.receiver: EventsApiReceiver | None = None # when using the events api instead of socket mode
+        self.slack_cache = SlackMetadataCache()
+        self.requesters: dict[str, str] = {} # queue key -> slack user id of whoever asked for the page
+
         self.prop_ws: aiohttp.ClientWebSocketResponse | None = None
         self.prop_ws_try_again_at = None
         self.prop_authenticated = False
 
         self.prop_message_index: int | None = None
         self.prop_message_token: str | None = None
+        self.catalog: PropCatalog | None = None
+        self.prop_handlers = {action: name and getattr(self, name) for action, name in PROP_ACTIONS.items()}
+        self._hello: codec.Frame | None = None
 
         self._tasks = []
         self.last_number: str | None = None
         self.pending: dict[str, DoubleEvent] = {}
+        self._page_tasks: dict[str, asyncio.Task] = {} # queue key -> the page() waiting on it, so step_down can cancel them
         self._current_nonce: tuple[str, ...] | None = None
 
         self.current_batch: list[tuple[str, str]] = []
-        self.current_batch_expires: int | None = None
+        self.current_batch_expires: float | None = None
 
         self.current_formatted = None
+        self.current_items: tuple[tuple[str, str], ...] | None = None
+        self.held_items: tuple[tuple[str, str], ...] | None = None # next batch, waiting for a carried number to expire
+        self.current_shown_at: float | None = None
+
+        self.failover: LeaseFailover | None = None
+        self.history: PageHistory | None = None
+        self.dashboard: Dashboard | None = None
+        self.recorder: TraceRecorder | None = None
+
+        self._phases: set[str] = set()
+        self.prop_ready = asyncio.Event()
+        self.monitor: LoopMonitor | None = None
     
+    def report_error(self, text: str) -> None:
+        logger.error(text)
+
+        if self.window is not None:
+            self.window.setup_err_signal.emit(text)
+
+    def status(self) -> dict:
+        """
+        A snapshot of connection and queue state, for anything that wants to show it outside the qt window.
+        """
+        if self.config is None: # not started, or the config couldn't be read, so nothing is connected
+            return {
+                "slack": False, "channel": None, "propresenter": False, "leader": None, "last_number": self.last_number,
+                "active": None, "active_by": [], "queued": [], "loop_lag": None,
+            }
+
+        try:
+            slack = self.handler.client  # type: ignore
+            slack_connected = (not slack.closed
+                and not slack.stale
+                and slack.current_session is not None
+                and not slack.current_session.closed)
+        except AttributeError:
+            slack_connected = self.receiver is not None and self.receiver.running
+
+        try:
+            queued: list[tuple[tuple[str, str], ...]] = list(self.number_queue._queue)  # type: ignore
+            if self.held_items:
+                queued.insert(0, self.held_items)
+        except AttributeError:
+            queued = []
+
+        if self.current_batch:
+            queued.append(tuple(self.current_batch))
+
+        return {
+            "slack": slack_connected,
+            "channel": self.config["bot"].get("listen-channel"),
+            "propresenter": self.prop_ws is not None and not self.prop_ws.closed and self.prop_authenticated,
+            "leader": self.failover.leader if self.failover else None,
+            "last_number": self.last_number,
+            "active": self.current_formatted,
+            "active_by": [self.slack_cache.user_name(self.requesters.get(key)) for key, _ in self.current_items or ()],
+            "queued": [self.process_number_batch(batch)[0] for batch in queued],
+            "loop_lag": self.monitor.lag if self.monitor else None,
+        }
+
     def setup_config(self):
         file = home + "/Documents/Village Kids Pager/config.toml"
         os.makedirs(os.path.dirname(file), exist_ok=True)
@@ -134,7 +238,7 @@ class Client(AsyncApp):
         
     async def task_add_batch_to_queue(self):
         batch_max: int = self.config["propresenter"]["batch-max-count"]
-        batch_wait: int = self.config["propresenter"]["batch-wait-time"]
+        batch_wait: float = self.config["propresenter"]["batch-wait-time"]
 
         while True:
             if not self.current_batch_expires:
@@ -146,7 +250,7 @@ class Client(AsyncApp):
             if len(self.current_batch) > batch_max:
                 batch = self.current_batch[0:batch_max]
                 self.current_batch = self.current_batch[batch_max:]
-                self.current_batch_expires = int(time.time()) + batch_wait
+                self.current_batch_expires = time.time() + batch_wait
             else:
                 batch = self.current_batch
                 self.current_batch = []
@@ -155,8 +259,8 @@ class Client(AsyncApp):
             self.number_queue.put_nowait(tuple(batch)) # type: ignore
 
     def add_to_queue(self, item: tuple[str, str]) -> None:
-        now = int(time.time())
-        batch_wait: int = self.config["propresenter"]["batch-wait-time"]
+        now = time.time()
+        batch_wait: float = self.config["propresenter"]["batch-wait-time"]
 
         self.current_batch.append(item)
 
@@ -186,30 +290,41 @@ class Client(AsyncApp):
             logger.info("slide free!")
 
             nums = await self.number_queue.get()
+            if not self.available.is_set():
+                # the slide was taken while we waited for a number (a takeover carrying the old leader's number), hold this batch until it frees
+                self.held_items = nums
+                await self.available.wait()
+                nums, self.held_items = self.held_items, None
+                if nums is None: # dropped by step_down in the meantime
+                    continue
+
             logger.info(f"got number(s): {nums}, sending!")
 
             formatted, msg_ids = self.process_number_batch(nums)
             self.current_formatted = formatted
+            self.current_items = nums
+            self.current_shown_at = time.time()
 
             self._current_nonce = msg_ids
             await self.propres_send_number(formatted)
 
             await self.pro7_send_waiter(msg_ids)
             self.current_formatted = None
+            self.current_items = None
 
     async def pro7_send_waiter(self, nonces: tuple[str, ...]) -> None:
         # pro7 doesnt send feedback for setting / hiding, so we have to guess based on timing.
         self.available.clear()
 
         for nonce in nonces:
-            event = self.pending[nonce]
-            event.set()
+            if event := self.pending.get(nonce): # gone if we stepped down in the meantime
+                event.set()
 
         await asyncio.sleep(self.config["propresenter"]["expire-time"])
 
         for nonce in nonces:
-            event = self.pending[nonce]
-            event.set_secondary()
+            if event := self.pending.get(nonce):
+                event.set_secondary()
 
         self._current_nonce = None
         self.available.set()
@@ -217,7 +332,8 @@ class Client(AsyncApp):
     async def task_prop_ws_pump(self) -> None:
         while self.prop_ws and not self.prop_ws.closed:
             try:
-                msg = await self.prop_ws.receive_json()
+                raw = await self.prop_ws.receive_str()
+                msg = codec.loads(raw)
             except Exception as e:
                 if not self.prop_ws.closed:
                     await self.prop_ws.close()
@@ -227,180 +343,190 @@ class Client(AsyncApp):
                 asyncio.create_task(self.setup_prop_connection())
                 return
                 
-            logger.debug(f"debug ws: {msg}")
-            if msg["action"] == "authenticate":
-                self.prop_authenticated = bool(msg["authenticated"])
+            if self.recorder:
+                self.recorder.record("prop-recv", msg)
 
-                if not self.prop_authenticated:
-                    logger.warning(f"Could not authenticate with ProPresenter: {msg['error']}")
-                    self.window.setup_err_signal.emit("The propresenter password is invalid. Correct it and restart the app.")
-                    await self.prop_ws.close()
-                    return
-
-                else:
-                    logger.info("Authenticated with propresenter!")
-                    await self.propres_request_message_list()
-
-            elif msg["action"] == "messageHide":  # PRO6 ONLY, MANUAL TIMER FOR PRO7
-                self.available.set()
-                if self._current_nonce:
-                    for nonce in self._current_nonce:
-                        event = self.pending[nonce]
-                        event.set_secondary()
-
-                self._current_nonce = None
-                self.current_formatted = None
-
-            elif msg["action"] == "messageSend":  # PRO6 ONLY, MANUAL TIMER FOR PRO7
-                self.available.clear()
-                if self._current_nonce:
-                    for nonce in self._current_nonce:
-                        event = self.pending[nonce]
-                        event.set()
-                    
-                    self._current_nonce = None
-                    self.current_formatted = None
-            
-            elif msg["action"] == "messageRequest":
-                self.propres_process_message_list(msg["messages"])
-            
-            elif msg["action"] == "presentationTriggerIndex" or msg["action"].startswith("clear"): # ignore these event
-                return
+            logger.debug("debug ws: %s", raw)
+            action = msg["action"]
+            handler = self.prop_handlers.get(action, False)
 
-            else:
-                logger.debug("Unknown payload: %s", msg)
+            if handler:
+                await handler(msg, raw)
+            elif handler is False and not action.startswith("clear"): # None and clear* are ignored
+                logger.debug("Unknown payload: %s", raw)
 
-    async def pro7_send_hello(self) -> None:
-        payload = {"action": "authenticate", "protocol": 701, "password": self.config["propresenter"]["password"]}
+    async def prop_on_authenticate(self, msg: dict, raw: str) -> None:
+        self.prop_authenticated = bool(msg["authenticated"])
 
-        if not self.prop_ws:
+        if not self.prop_authenticated:
+            logger.warning(f"Could not authenticate with ProPresenter: {msg['error']}")
+            self.report_error("The propresenter password is invalid. Correct it and restart the app.")
+            await self.prop_ws.close()  # type: ignore # ends the pump
             return
 
-        await self.prop_ws.send_json(payload)
+        logger.info("Authenticated with propresenter!")
+        self.log_phase("propresenter authenticated")
+        self.propres_use_cached_message()
+        await self.propres_request_message_list()
 
-    async def propres_send_number(self, number: str) -> None:
-        payload = {"action": "messageSend", "messageIndex": self.prop_message_index, "messageKeys": [self.prop_message_token], "messageValues": [number]}
+    async def prop_on_message_hide(self, msg: dict, raw: str) -> None:  # PRO6 ONLY, MANUAL TIMER FOR PRO7
+        self.available.set()
+        if self._current_nonce:
+            for nonce in self._current_nonce:
+                event = self.pending[nonce]
+                event.set_secondary()
 
-        if not self.prop_ws:
-            return
+        self._current_nonce = None
+        self.current_formatted = None
 
-        await self.prop_ws.send_json(payload)
+    async def prop_on_message_send(self, msg: dict, raw: str) -> None:  # PRO6 ONLY, MANUAL TIMER FOR PRO7
+        self.available.clear()
+        if self._current_nonce:
+            for nonce in self._current_nonce:
+                event = self.pending[nonce]
+                event.set()
 
-    async def propres_cancel_number(self) -> None:
-        payload = {"action": "messageHide", "index": 0}
+            self._current_nonce = None
+            self.current_formatted = None
+
+    async def prop_on_message_request(self, msg: dict, raw: str) -> None:
+        await self.propres_process_message_list(msg["messages"], raw)
 
-        if not self.prop_ws:
+    async def prop_send(self, payload: dict | codec.Frame) -> None:
+        if not self.prop_ws or (self.failover and not self.failover.leader):
             return
 
-        await self.prop_ws.send_json(payload)
+        if isinstance(payload, codec.Frame):
+            data, text = payload.payload, payload.text
+        else:
+            data, text = payload, codec.dumps(payload)
+
+        if self.recorder:
+            self.recorder.record("prop-send", data)
+
+        await self.prop_ws.send_str(text)
+
+    async def pro7_send_hello(self) -> None:
+        if self._hello is None: # the password only changes with a restart
+            self._hello = codec.Frame({"action": "authenticate", "protocol": 701, "password": self.config["propresenter"]["password"]})
+
+        await self.prop_send(self._hello)
+
+    async def propres_send_number(self, number: str) -> None:
+        payload = {"action": "messageSend", "messageIndex": self.prop_message_index, "messageKeys": [self.prop_message_token], "messageValues": [number]}
+        await self.prop_send(payload)
+
+    async def propres_cancel_number(self) -> None:
+        await self.prop_send(MESSAGE_HIDE)
 
     async def propres_request_message_list(self):
-        if self.prop_ws is None:
-            return
-        
         #if self.prop_message_index is None or self.prop_message_token is None:
         # we'll update this every time
-        await self.prop_ws.send_json({"action": "messageRequest"})
+        await self.prop_send(MESSAGE_REQUEST)
     
-    def propres_process_message_list(self, msg_list):
-        found = False # cursed but here we are
-        textFinder = re.compile(r"\$\{([a-zA-Z0-9]+)\}")
-
-        for idx, msg in enumerate(msg_list):
-            if "vk" in msg["messageTitle"].lower():
-                components = msg["messageComponents"]
-                for text in components:
-                    if match := textFinder.match(text):
-                        self.prop_message_index = idx
-                        self.prop_message_token = match.group(1)
-                        found = True
-                        break
-            
-            if found:
-                break
-        
-        if not found:
-            self.window.setup_err_signal.emit("Could not auto-detect a propresenter message to use. Please set one up and restart the app.")
-        else:
-            self.write_config()
+    def propres_use_cached_message(self) -> None:
+        # same library as last time, page with the cached message while the fresh list is on its way
+        if self.prop_ready.is_set() or self.catalog is None or self.catalog.fingerprint is None:
+            return
 
-    async def propres_create_message(self):
-        client = aiohttp.ClientSession()
+        if found := self.catalog.find(self.config["propresenter"].get("message")):
+            self.prop_message_index, self.prop_message_token = found
+            self.log_phase("propresenter message from cache")
+            self.prop_ready.set()
 
-        url = yarl.URL(f"http://{self.config['propresenter']['host']}:{self.config['propresenter']['port']}/v1/themes")
+    async def propres_process_message_list(self, msg_list: list[dict], raw: str):
+        if self.catalog is None:
+            self.catalog = PropCatalog(None, "")
 
-        async with client.get(url) as resp:
-            if resp.status != 200:
-                self.window.setup_err_signal.emit("Failed to connect to propresenter: network is not enabled.")
-                return
-            
-            themes = await resp.json()
-            themes = themes["themes"]
-        
+        changed = self.catalog.update(msg_list, raw)
 
-        # search themes for vk slide
-        # each theme can have its own VK number so we'll just grab the first one we'll find and the user can fix it if it's wrong
-        # fall back to something random
-        
-        slide = None
-            
-        def finder(slides: list[dict]) -> dict | None:
-            for slide in slides:
-                if "vk" in slide["id"]["name"].lower():
-                    return slide["id"]
-            
-            return None
-        
-        for theme in themes:
-            if slide := finder(theme["slides"]):
-                break
-        
-        if slide is None:
-            slide = themes[0]["slides"][0]["id"] # good enough default, assuming they have at least one theme
+        name = self.config["propresenter"].get("message")
+        found = self.catalog.find(name)
 
-        # create payload
-        payload = {
-            "id": {
-                "name": "Test Message",
-                "uuid": "942C3FC3-C4B2-44F7-A55D-4CC913BB8A5D",
-                "index": 0
-            },
-            "message": "VK: {Number}",
-            "tokens": [
-                {
-                    "name": "Number",
-                    "text": {
-                        "text": "142"
+        if found is None:
+            if name:
+                self.report_error(f"Could not find a propresenter message named \"{name}\" with a token in it. Check the config and restart the app.")
+            else:
+                self.report_error("Could not auto-detect a propresenter message to use. Please set one up and restart the app.")
+            return
+
+        if not changed and self.prop_ready.is_set() and found == (self.prop_message_index, self.prop_message_token):
+            return # nothing moved since the message was last picked
+
+        self.prop_message_index, self.prop_message_token = found
+        self.log_phase("propresenter message found")
+        self.prop_ready.set()
+
+        # both off the loop, the pump waits for them so two writes never overlap
+        if changed:
+            await asyncio.to_thread(self.catalog.save)
+
+        internal = self.config.get("internal", {})
+        if (internal.get("prop_msg_idx"), internal.get("prop_msg_token")) != (self.prop_message_index, self.prop_message_token):
+            await asyncio.to_thread(self.write_config) # only when it changed, this runs on every messageRequest
+
+    async def propres_create_message(self):
+        url = yarl.URL(f"http://{self.config['propresenter']['host']}:{self.config['propresenter']['port']}/v1/themes")
+
+        async with aiohttp.ClientSession() as client:
+            async with client.get(url) as resp:
+                if resp.status != 200:
+                    self.report_error("Failed to connect to propresenter: network is not enabled.")
+                    return
+
+                themes = await resp.json()
+
+            # each theme can have its own VK slide so we'll just grab the first one we'll find and the user can fix it if it's wrong
+            # falls back to the first slide, assuming they have at least one theme
+            if self.catalog is None:
+                self.catalog = PropCatalog(None, "")
+
+            self.catalog.index_themes(themes["themes"])
+            slide = self.catalog.find_theme_slide()
+
+            # create payload
+            payload = {
+                "id": {
+                    "name": self.config["propresenter"].get("message") or "VK Number",
+                    "uuid": str(uuid.uuid4()).upper(),
+                    "index": 0
+                },
+                "message": "VK: {Number}",
+                "tokens": [
+                    {
+                        "name": "Number",
+                        "text": {
+                            "text": "142"
+                        }
                     }
-                }
-            ],
-            "theme": slide,
-        }
+                ],
+                "theme": slide,
+            }
+
+            # send request to create new message
+            async with client.post(url.with_path("/v1/messages"), json=payload) as resp:
+                if resp.status != 200:
+                    self.report_error("Failed to connect to propresenter: network is not enabled.")
+                    return
 
-        # send request to create new message
-        url = url.with_path("/v1/messages")
+                data = await resp.json()
 
-        async with client.post(url) as resp:
-            if resp.status != 200:
-                self.window.setup_err_signal.emit("Failed to connect to propresenter: network is not enabled.")
-            
-            data = await resp.json()
+        await asyncio.to_thread(self.catalog.save)
 
         # store index and token
-            
         self.prop_message_token = payload["tokens"][0]["name"] # pull from payload for ease of changing
         self.prop_message_index = data["id"]["index"]
-    
 
     async def fetch_channel_list(self) -> list[Channel]:
         """
-        Fetches a list of channels that the bot has access to.
+        Fetches a list of channels that the bot has access to, from the metadata cache when it's fresh.
         """
-        channels = await self.client.users_conversations(exclude_archived=True)
-        return [
-            {"name": x["name"], "id": x["id"]}
-            for x in channels if x["is_channel"]
-        ]
+        return await self.slack_cache.channel_list()
+
+    async def on_metadata_event(self, event: dict) -> None:
+        handler = getattr(self.slack_cache, METADATA_EVENTS.get(event.get("type", ""), ""), None)
+        if handler:
+            handler(event)
 
     async def setup_asyncio(self):
         logger.handlers[0].setLevel(logging.DEBUG)
@@ -413,7 +539,33 @@ class Client(AsyncApp):
         self._tasks.append(asyncio.create_task(self.task_send_numbers()))
         self._tasks.append(asyncio.create_task(self.task_add_batch_to_queue()))
 
+        if self.config.get("history", {}).get("enabled", True):
+            self.history = await asyncio.to_thread(PageHistory, home + "/Documents/Village Kids Pager/history.sqlite3")
+            self._tasks.append(asyncio.create_task(self.history.task_flush()))
+
+            if self.last_number is None: # so repeat still works after a restart
+                recent = await asyncio.to_thread(self.history.recent_numbers, 1)
+                self.last_number = recent[0] if recent else None
+
+        prop = self.config["propresenter"]
+        catalog_path = home + "/Documents/Village Kids Pager/propresenter-catalog.json" if prop.get("catalog-cache", True) else None
+        self.catalog = PropCatalog(catalog_path, f"{prop['host']}:{prop['port']}")
+        await asyncio.to_thread(self.catalog.load)
+
+        slow_callback: int = self.config.get("debug", {}).get("slow-callback-ms", 100)
+        self.monitor = LoopMonitor(self, slow_callback=slow_callback / 1000)
+        self._tasks.append(self.monitor.start())
+
+        if self.config.get("debug", {}).get("record-trace", False):
+            trace_dir = home + "/Documents/Village Kids Pager/traces"
+            self.recorder = TraceRecorder(trace_dir + time.strftime("/trace-%Y%m%d-%H%M%S.jsonl"))
+            self.recorder.start(self.config)
+            self._tasks.append(asyncio.create_task(self.recorder.task_flush()))
+
     async def setup_prop_connection(self):
+        if self.failover and not self.failover.leader: # the standby never talks to propresenter
+            return
+
         client = aiohttp.ClientSession()
         host = self.config["propresenter"]["host"]
         port = self.config["propresenter"]["port"]
@@ -421,6 +573,9 @@ class Client(AsyncApp):
         backoff = 5
 
         while True:
+            if self.failover and not self.failover.leader: # stepped down while we were retrying
+                await client.close()
+                return
 
             try:
                 self.prop_ws = await client.ws_connect(f"ws://{host}:{port}/remote")
@@ -435,83 +590,309 @@ class Client(AsyncApp):
             backoff = 1
             client.detach()
 
+            if self.failover and not self.failover.leader: # stepped down while connecting
+                await self.prop_ws.close()
+                return
+
             self._tasks.append(asyncio.create_task(self.task_prop_ws_pump()))
 
             logger.info("Connected to propresenter. Sending HELLO")
+            self.log_phase("propresenter connected")
             await self.pro7_send_hello()
 
             break
 
+    def publish(self, kind: str, number: str) -> None:
+        if self.dashboard:
+            self.dashboard.broadcaster.publish(kind, {"number": number})
+
+    async def react(self, channel_id: str, name: str, msg_ts: str) -> None:
+        if self.failover and not self.failover.leader: # only the leader reacts, a standby's reactions would double up
+            return
+
+        await self.client.reactions_add(channel=channel_id, name=name, timestamp=msg_ts)
+
+    async def page(
+        self, channel_id: str, msg_ts: str, num: str, hourglass: bool = True, key: str | None = None, react: bool = True,
+        requester: str | None = None,
+    ) -> None:
+        # key identifies this page in the queue, it only differs from msg_ts when one message pages several numbers
+        key = key or msg_ts
+        self.pending[key] = event = DoubleEvent()
+        self._page_tasks[key] = asyncio.current_task()  # type: ignore
+        try:
+            await self._page(channel_id, msg_ts, num, hourglass, key, react, requester, event)
+        finally:
+            self.pending.pop(key, None)
+            self.requesters.pop(key, None)
+            self._page_tasks.pop(key, None)
+
+    async def _page(
+        self, channel_id: str, msg_ts: str, num: str, hourglass: bool, key: str, react: bool, requester: str | None, event: DoubleEvent
+    ) -> None:
+        if requester:
+            self.requesters[key] = requester
+            asyncio.create_task(self.slack_cache.user(requester)) # warm the cache so the ui has a name to show
+        if hourglass and (
+            self.number_queue.qsize() > 0
+            or self._current_nonce
+            or len(self.current_batch) >= self.config["propresenter"]["batch-max-count"]
+        ):
+            logger.debug("queue is busy, hourglassing new number")
+            asyncio.create_task(
+                self.react(channel_id, "hourglass", msg_ts)
+            )  # HOURGLASS (waiting) # create a task to ignore ratelimit effects
+
+        self.add_to_queue((key, num))
+        self.publish("queued", num)
+        if self.history:
+            prop = self.config["propresenter"]
+            self.history.queued(key, msg_ts, num, f"{prop['host']}:{prop['port']}#{self.prop_message_index}")
+
+        await event.wait()
+        self.publish("shown", num)
+        if self.history:
+            self.history.shown(key)
+        if react:
+            await self.react(channel_id, "calling", msg_ts)  # CALLING
+
+        await event.wait_secondary()
+        self.publish("cleared", num)
+        if self.history:
+            self.history.cleared(key)
+        if react:
+            await self.react(channel_id, "thumbsup", msg_ts)  # THUMBSUP
+
+    async def repeat(self, channel_id: str, msg_ts: str, content: str, requester: str | None = None) -> None:
+        # "repeat" pages the last number again, "repeat last 3" the last 3 numbers.
+        # "repeat 1234" never gets here, an explicit number is just paged like any other
+        if match := re.search(r"last\s+(\d+)", content):
+            count = min(int(match.group(1)), 10)
+            numbers = await asyncio.to_thread(self.history.recent_numbers, count) if self.history else []
+            numbers.reverse() # oldest first, so they're shown in the order they were originally paged
+
+        else:
+            numbers = [self.last_number] if self.last_number else []
+
+        if not numbers:
+            await self.react(channel_id, "thumbsdown", msg_ts)
+            return
+
+        if len(numbers) == 1:
+            await self.page(channel_id, msg_ts, numbers[0], requester=requester)
+            return
+
+        # only the last number reacts, it's the last to be shown and cleared
+        await asyncio.gather(*(
+            self.page(channel_id, msg_ts, num, hourglass=(i == 0), key=f"{msg_ts}#{i}", react=(i == len(numbers) - 1), requester=requester)
+            for i, num in enumerate(numbers)
+        ))
+
     async def on_message(self, message: dict) -> None:
         logger.debug("received message from slack: %s", message)
+        if self.recorder:
+            self.recorder.record("slack", message)
+
         channel_id: str = message["channel"]
         content: str = message["text"]
         msg_ts: str = message["ts"]
 
         if channel_id != self.config["bot"]["listen-channel"]:
             return
+
+        if self.failover and not self.failover.leader:
+            self.failover.forward(message)
+            return
         
         if content.startswith("!"): # ignore messages that start with !
             return
 
-        async def sender(num: str):
-            self.pending[msg_ts] = event = DoubleEvent()
-            if (
-                self.number_queue.qsize() > 0
-                or self._current_nonce
-                or len(self.current_batch) >= self.config["propresenter"]["batch-max-count"]
-            ):
-                logger.debug("queue is busy, hourglassing new number")
-                asyncio.create_task(
-                    self.client.reactions_add(channel=channel_id, name="hourglass", timestamp=msg_ts)
-                )  # HOURGLASS (waiting) # create a task to ignore ratelimit effects
-
-            self.add_to_queue((msg_ts, num))
-
-            await event.wait()
-            await self.client.reactions_add(channel=channel_id, name="calling", timestamp=msg_ts)  # CALLING
-
-            await event.wait_secondary()
-            await self.client.reactions_add(channel=channel_id, name="thumbsup", timestamp=msg_ts)  # THUMBSUP
-
-            del self.pending[msg_ts]
-
         number = re.search(r"(?:\d){4}", content)
 
+        if "repeat" in content.lower() and not number:
+            await self.repeat(channel_id, msg_ts, content.lower(), message.get("user"))
+            return
+
         if number:
             num = number.group(0)
             if num in self.config["bot"].get("ignore-numbers", []):
-                await self.client.reactions_add(channel=channel_id, name="x", timestamp=msg_ts) # RED CROSS
+                await self.react(channel_id, "x", msg_ts) # RED CROSS
                 return
 
             self.last_number = num
-            await sender(self.last_number)
+            await self.page(channel_id, msg_ts, self.last_number, requester=message.get("user"))
 
-        elif "repeat" in content.lower():
-            if self.last_number:
-                await sender(self.last_number)
-            else:
-                await self.client.reactions_add(channel=channel_id, name="thumbsdown", timestamp=msg_ts)
+        elif "cancel" in content.lower():
+            await self.propres_cancel_number()
+            await self.react(channel_id, "thumbsup", msg_ts)
+            return
 
+    def snapshot_state(self) -> dict:
+        """
+        The queue state replicated to the standby through the failover lease.
+        """
+        queued: list[tuple[str, str]] = list(self.held_items or ())
+        for batch in list(self.number_queue._queue):  # type: ignore
+            queued.extend(batch)
+
+        queued.extend(self.current_batch)
+
+        return {
+            "last_number": self.last_number,
+            "queued": queued,
+            "showing": list(self.current_items or ()),
+            "shown_at": self.current_shown_at,
+        }
+
+    async def take_over(self, state: dict) -> None:
+        channel_id: str = self.config["bot"]["listen-channel"]
+
+        if state.get("last_number"):
+            self.last_number = state["last_number"]
+
+        # whatever was on screen stays there until it expires, we just finish off the slack side of it
+        # and keep the slide marked as taken so the carried queue waits its turn
+        remaining = self.config["propresenter"]["expire-time"] - (time.time() - (state.get("shown_at") or 0))
+        if state.get("showing") and remaining > 0:
+            self.available.clear()
+            asyncio.get_running_loop().call_later(remaining, self.available.set)
+
+        for key, _ in state.get("showing", []):
+            msg_ts = key.split("#")[0]
+            asyncio.create_task(self._finish_carried(channel_id, msg_ts, remaining))
+
+        for key, num in state.get("queued", []):
+            if key not in self.pending:
+                msg_ts = key.split("#")[0]
+                asyncio.create_task(self.page(channel_id, msg_ts, num, hourglass=False, key=key)) # already hourglassed by the old leader
+
+        if state.get("queued") or state.get("showing"):
+            logger.info(f"Took over {len(state.get('queued', []))} queued and {len(state.get('showing', []))} showing numbers")
+
+        if self.prop_ws is None or self.prop_ws.closed:
+            asyncio.create_task(self.setup_prop_connection())
+
+    async def _finish_carried(self, channel_id: str, msg_ts: str, remaining: float) -> None:
+        await asyncio.sleep(max(0.0, remaining))
+        await self.react(channel_id, "thumbsup", msg_ts)  # THUMBSUP
+
+    async def step_down(self) -> None:
+        # the new leader has our queue from the last snapshot, drop ours so nothing is paged twice.
+        # the pages waiting on it are cancelled too, otherwise they'd hang around in pending and
+        # take_over would skip those keys if we ever became leader again
+        self.current_batch = []
+        self.current_batch_expires = None
+        self.held_items = None
+        while not self.number_queue.empty():
+            self.number_queue.get_nowait()
+
+        for task in set(self._page_tasks.values()):
+            task.cancel()
+
+        self.pending.clear()
+        self.requesters.clear()
+        self._page_tasks.clear()
+        self._current_nonce = None
+
+        if self.prop_ws and not self.prop_ws.closed:
+            await self.prop_ws.close()
+
+    def log_phase(self, phase: str) -> None:
+        # startup timing, each phase is only logged the first time (reconnects go through the same code)
+        if phase in self._phases:
             return
 
-        elif "cancel" in content.lower():
-            await self.propres_cancel_number()
-            await self.client.reactions_add(channel=channel_id, name="thumbsup", timestamp=msg_ts)
+        self._phases.add(phase)
+        logger.info(f"startup: {phase} after {(time.perf_counter() - STARTED) * 1000:.0f}ms")
+
+    def read_token_cache(self) -> dict | None:
+        try:
+            with open(TOKEN_CACHE) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        network = self.config["network"]
+        if cached.get("target") != network.get("target") or cached.get("team") != network.get("team"):
+            return None
+
+        return cached
+
+    def write_token_cache(self, tokens: tuple[str, str] | None, etag: str | None = None) -> None:
+        if tokens is None:
+            if os.path.exists(TOKEN_CACHE):
+                os.remove(TOKEN_CACHE)
             return
 
-    async def fetch_tokens(self) -> None:
+        hours: float = self.config["network"].get("token-cache-hours", 24)
+        payload = {
+            "target": self.config["network"].get("target"),
+            "team": self.config["network"].get("team"),
+            "expires": time.time() + hours * 3600,
+            "etag": etag,
+            "app-token": tokens[0],
+            "bot-token": tokens[1],
+        }
+
+        tmp = TOKEN_CACHE + ".tmp"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(payload, f)
+
+        os.replace(tmp, TOKEN_CACHE)
+
+    async def get_tokens(self, use_cache: bool = True, need_app_token: bool = True) -> tuple[tuple[str, str], bool]:
+        """
+        Returns the (app token, bot token) and whether they came from the local cache.
+        The events api only needs the bot token, so need_app_token=False settles for a configured bot token on its own.
+        """
+        app_token = self.config["bot"].get("app-token", None)
+        bot_token = self.config["bot"].get("bot-token", None)
+        if bot_token and (app_token or not need_app_token):
+            return (app_token or "", bot_token), False
+
+        cached = None
+        if use_cache and "network" in self.config:
+            cached = await asyncio.to_thread(self.read_token_cache)
+
+        if cached and cached["expires"] >= time.time():
+            logger.info("Using cached tokens")
+            return (cached["app-token"], cached["bot-token"]), True
+
+        logger.info("Tokens not found in config file, attempting to fetch from server")
+        fetched = await self.fetch_tokens(cached["etag"] if cached else None)
+
+        if fetched is None: # 304, the expired cache is still good
+            logger.info("Cached tokens are still current")
+            tokens, etag = (cached["app-token"], cached["bot-token"]), cached["etag"]  # type: ignore
+        else:
+            tokens, etag = fetched
+
+        await asyncio.to_thread(self.write_token_cache, tokens, etag)
+        return tokens, fetched is None
+
+    async def fetch_tokens(self, etag: str | None = None) -> tuple[tuple[str, str], str | None] | None:
+        """
+        Fetches tokens from the token server. With an etag, returns None if the tokens haven't changed.
+        """
         if "network" not in self.config:
             raise RuntimeError("Unable to fetch tokens, network information not given")
         
         target: str = self.config["network"]["target"]
         auth: str = self.config["network"]["simpleauth-pass"]
+        team: str | None = self.config["network"].get("team") or None
 
         if not target.endswith("/"):
             target += "/"
 
+        headers = {"Authorization": auth}
+        if etag:
+            headers["If-None-Match"] = etag
+
         async with aiohttp.ClientSession() as session:
-            async with session.get(target + "fetch", headers={"Authorization": auth}) as resp:
+            async with session.get(target + "fetch", headers=headers, params={"team": team} if team else None) as resp:
+                if resp.status == 304:
+                    return None
+
                 if resp.status == 401:
                     raise RuntimeError("Unable to fetch tokens, simpleauth invalid")
 
@@ -520,27 +901,131 @@ class Client(AsyncApp):
 
                 try:
                     data = await resp.json()
-                    self.config["bot"]["app-token"] = data["app-token"]
-                    self.config["bot"]["bot-token"] = data["bot-token"]
+                    tokens = data["app-token"], data["bot-token"]
                     logger.info("Successfully fetched tokens")
                 except:
                     logger.critical(await resp.text())
                     raise RuntimeError("Unable to fetch tokens, could not use returned payload")
 
+                return tokens, resp.headers.get("ETag")
+
+    async def setup_slack(self) -> None:
+        if self.config["bot"].get("ingress", "socket") == "events":
+            await self.setup_events_ingress()
+            return
+
+        # import in a worker so it overlaps with the propresenter connection instead of holding up the loop
+        await asyncio.to_thread(importlib.import_module, "slack_bolt.adapter.socket_mode.async_handler")
+        from slack_bolt.app.async_app import AsyncApp
+        from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+        from slack_sdk.errors import SlackApiError
+        self.log_phase("slack_bolt imported")
+
+        async def connect(app_token: str, bot_token: str, cached: bool) -> None:
+            self.app = AsyncApp(token=bot_token)
+            self.client = self.app.client
+            self.app.event("message")(self.on_message)
+            for name in METADATA_EVENTS:
+                self.app.event(name)(self.on_metadata_event)
+
+            self.handler = AsyncSocketModeHandler(self.app, app_token)
+            try:
+                # the socket mode client retries bad tokens forever, so open the connection url ourselves to see auth errors.
+                # connect() reuses the url, so this doesn't cost an extra round trip.
+                # that only checks the app token though, and the server reissues the bot token on every oauth,
+                # so a cached bot token gets its own auth.test alongside it
+                checks = [self.handler.client.issue_new_wss_url()]
+                if cached:
+                    checks.append(self.client.auth_test())
+
+                self.handler.client.wss_uri, *_ = await asyncio.gather(*checks)
+            except aiohttp.ClientError:
+                pass # offline, connect() will keep retrying
+            except SlackApiError:
+                await self.handler.client.close()
+                raise
+
+            await self.handler.connect_async()
+
+        await self.connect_with_tokens(connect)
+        self.slack_connected()
+
+    async def setup_events_ingress(self) -> None:
+        await asyncio.to_thread(importlib.import_module, "slack_sdk.web.async_client")
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        events: dict = self.config.get("events-api", {})
+        if not events.get("signing-secret"):
+            raise RuntimeError("The events api ingress needs [events-api] signing-secret")
+
+        async def connect(app_token: str, bot_token: str, cached: bool) -> None:
+            self.client = AsyncWebClient(token=bot_token)
+            if cached:
+                try:
+                    await self.client.auth_test()
+                except aiohttp.ClientError:
+                    pass # offline, the reactions will retry
+
+        await self.connect_with_tokens(connect, need_app_token=False)
+
+        self.receiver = EventsApiReceiver(
+            self, events["signing-secret"], events.get("host", "0.0.0.0"), events.get("port", 3000), events.get("path", "/slack/events")
+        )
+        await self.receiver.start()
+        self.slack_connected()
+
+    async def connect_with_tokens(self, connect: Callable[[str, str, bool], Awaitable[None]], need_app_token: bool = True) -> None:
+        """
+        Runs `connect(app token, bot token, cached)` for either ingress. If slack rejects tokens that came from the
+        local cache (the server may have reissued them), the cache is dropped and connect runs again with fresh ones.
+        """
+        from slack_sdk.errors import SlackApiError
+
+        use_cache = True
+        while True:
+            (app_token, bot_token), cached = await self.get_tokens(use_cache, need_app_token)
+            self.log_phase("tokens ready")
+            try:
+                await connect(app_token, bot_token, cached)
+                return
+            except SlackApiError as e:
+                if not cached:
+                    raise
+
+                logger.warning("Could not connect to slack with cached tokens, fetching new ones", exc_info=e)
+                await asyncio.to_thread(self.write_token_cache, None)
+                use_cache = False
+
+    def slack_connected(self) -> None:
+        self.log_phase("slack connected")
+        self.slack_cache.client = self.client
+        self._tasks.append(asyncio.create_task(self.slack_cache.prefetch()))
+        self._tasks.append(asyncio.create_task(self.slack_cache.task_refresh()))
+
     async def start(self):
+        # propresenter and slack come up side by side, neither depends on the other
+        self.log_phase("asyncio thread started")
         await self.setup_asyncio()
 
-        if not self.config["bot"].get("app-token", None) or not self.config["bot"].get("bot-token", None):
-            logger.info("Tokens not found in config file, attempting to fetch from server")
-            await self.fetch_tokens()
-        
-        super().__init__(token=self.config["bot"]["bot-token"]) # cursed
-        self.event("message")(self.on_message)
+        if self.config.get("dashboard", {}).get("enabled", False):
+            dashboard = self.config["dashboard"]
+            self.dashboard = Dashboard(self, dashboard.get("host", "0.0.0.0"), dashboard.get("port", 8089))
+            self._tasks.append(await self.dashboard.start())
+
+        if self.config.get("failover", {}).get("enabled", False):
+            failover = self.config["failover"]
+            self.failover = LeaseFailover(
+                self, failover["lease-file"], failover.get("node-name") or None, failover.get("lease-time", 3)
+            )
+            self._tasks.append(asyncio.create_task(self.failover.task_lease()))
+        else:
+            asyncio.create_task(self.setup_prop_connection())
 
-        asyncio.create_task(self.setup_prop_connection())
+        slack = asyncio.create_task(self.setup_slack())
+        await asyncio.gather(slack, self.prop_ready.wait())
+        self.log_phase("ready to page")
 
-        self.handler = AsyncSocketModeHandler(self, self.config["bot"]["app-token"])
-        await self.handler.start_async()
+        await asyncio.Event().wait() # run forever, the socket mode client runs in its own tasks
     
     def read_config(self) -> dict | None:
         cfg = "config.toml"
@@ -549,14 +1034,14 @@ class Client(AsyncApp):
         
         if not os.path.exists(cfg) or os.path.isdir(cfg):
             self.setup_config()
-            self.window.setup_err_signal.emit("A config could not be found, and one was generated. Please fill it out and restart the app.")
+            self.report_error("A config could not be found, and one was generated. Please fill it out and restart the app.")
             return None
         
         with open(cfg) as f:
             config = toml.load(f)
         
         if not config["propresenter"]["password"]:
-            self.window.setup_err_signal.emit("The configured propresenter password is empty. Propresenter does not allow this, please configure a password and restart the app.")
+            self.report_error("The configured propresenter password is empty. Propresenter does not allow this, please configure a password and restart the app.")
             return None
         
         if "internal" in config:
@@ -584,7 +1069,7 @@ class Client(AsyncApp):
         with open(cfg, mode="w") as f:
             toml.dump(config, f)
     
-    def run(self, window: MainWindow):
+    def run(self, window: MainWindow | None = None):
         self.window = window
         self.config: dict = self.read_config() # type: ignore
         
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import TypedDict
+
+logger = logging.getLogger("bot.catalog")
+
+TOKEN_FINDER = re.compile(r"\$\{([a-zA-Z0-9]+)\}")
+
+
+class CatalogMessage(TypedDict):
+    index: int
+    title: str
+    tokens: list[str]
+    hash: str
+
+
+class PropCatalog:
+    """
+    Index of the propresenter messages (and pro7 themes) by name and token.
+    It's kept on disk with a fingerprint of the message list, so a reconnect to the same library can use
+    the cached message straight away, and a changed list only reparses the messages that actually changed.
+    """
+    def __init__(self, path: str | None, library: str) -> None:
+        self.path = path # None to keep it in memory only
+        self.library = library # host:port, a cache from a different propresenter is ignored
+
+        self.fingerprint: str | None = None
+        self.messages: list[CatalogMessage] = []
+        self.by_title: dict[str, CatalogMessage] = {}
+        self.by_token: dict[str, list[CatalogMessage]] = {}
+        self._found: dict[str | None, tuple[int, str] | None] = {} # find() results, until the list changes
+        self.themes: dict[str, dict] = {} # slide name -> theme slide id, from the pro7 http api
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable propresenter catalog: {e}")
+            return
+
+        if data.get("library") != self.library:
+            return
+
+        self.fingerprint = data["fingerprint"]
+        self.themes = data.get("themes", {})
+        self.reindex(data["messages"])
+        logger.debug(f"Loaded {len(self.messages)} propresenter messages from the catalog cache")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+
+        data = {"library": self.library, "fingerprint": self.fingerprint, "messages": self.messages, "themes": self.themes}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+
+        os.replace(tmp, self.path)
+
+    def update(self, msg_list: list[dict], raw: str) -> bool:
+        """
+        Refreshes the index from a messageRequest reply, `raw` being the frame as it came off the socket.
+        Returns False when nothing changed.
+        """
+        fingerprint = hashlib.sha1(raw.encode()).hexdigest() # one hash of the whole frame for the common, unchanged case
+        if fingerprint == self.fingerprint:
+            return False
+
+        hashes = [digest(msg) for msg in msg_list]
+        known = {m["hash"]: m for m in self.messages}
+        messages: list[CatalogMessage] = []
+        reparsed = 0
+
+        for idx, (msg, h) in enumerate(zip(msg_list, hashes)):
+            if entry := known.get(h):
+                messages.append({**entry, "index": idx}) # only moved, if anything
+                continue
+
+            tokens = [match.group(1) for text in msg["messageComponents"] if (match := TOKEN_FINDER.match(text))]
+            messages.append({"index": idx, "title": msg["messageTitle"], "tokens": tokens, "hash": h})
+            reparsed += 1
+
+        logger.debug(f"Propresenter message list changed, reparsed {reparsed} of {len(messages)} messages")
+        self.fingerprint = fingerprint
+        self.reindex(messages)
+        return True
+
+    def reindex(self, messages: list[CatalogMessage]) -> None:
+        self.messages = messages
+        self.by_title = {}
+        self.by_token = {}
+        self._found = {}
+
+        for msg in messages:
+            self.by_title.setdefault(msg["title"].lower(), msg)
+            for token in msg["tokens"]:
+                self.by_token.setdefault(token, []).append(msg)
+
+    def find(self, name: str | None = None) -> tuple[int, str] | None:
+        """
+        The (index, token) of the message to page with. By title when a name is configured,
+        otherwise the first message with "vk" in its title and a token to fill in.
+        """
+        if name in self._found:
+            return self._found[name]
+
+        found = None
+        if name:
+            msg = self.by_title.get(name.strip().lower())
+            if msg is not None and msg["tokens"]:
+                found = msg["index"], msg["tokens"][0]
+        else:
+            for msg in self.messages:
+                if "vk" in msg["title"].lower() and msg["tokens"]:
+                    found = msg["index"], msg["tokens"][0]
+                    break
+
+        self._found[name] = found
+        return found
+
+    def index_themes(self, themes: list[dict]) -> None:
+        self.themes = {}
+        for theme in themes:
+            for slide in theme["slides"]:
+                self.themes.setdefault(slide["id"]["name"], slide["id"])
+
+    def find_theme_slide(self) -> dict | None:
+        for name, slide in self.themes.items():
+            if "vk" in name.lower():
+                return slide
+
+        return next(iter(self.themes.values()), None)
+
+
+def digest(msg: dict) -> str:
+    return hashlib.sha1(json.dumps(msg, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,67 @@
+"""
+json encoding for the propresenter websocket and the token server.
+uses orjson when it's installed (pip install orjson), otherwise the stdlib json module.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger("bot.codec")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+backend: str = ""
+dumps: Callable[[Any], str]
+dumpb: Callable[[Any], bytes]
+loads: Callable[[str | bytes], Any]
+
+
+def use(name: str | None = None) -> str:
+    """
+    Switches the backend, "orjson" or "json". Defaults to the fastest one available.
+    """
+    global backend, dumps, dumpb, loads
+
+    if name is None:
+        name = "orjson" if orjson is not None else "json"
+
+    if name == "orjson":
+        if orjson is None:
+            raise RuntimeError("orjson is not installed")
+
+        _dumps = orjson.dumps
+        dumps = lambda obj: _dumps(obj).decode()
+        dumpb = _dumps
+        loads = orjson.loads
+
+    elif name == "json":
+        encoder = json.JSONEncoder(separators=(",", ":"))
+        dumps = encoder.encode
+        dumpb = lambda obj: encoder.encode(obj).encode()
+        loads = json.loads
+
+    else:
+        raise ValueError(f"unknown json backend {name!r}")
+
+    backend = name
+    logger.debug(f"Using {name} for json")
+    return name
+
+
+class Frame:
+    """
+    A payload that never changes, encoded once up front instead of on every send.
+    """
+    __slots__ = ("payload", "text")
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self.text = dumps(payload)
+
+
+use()
@@ -5,6 +5,7 @@ bot-token = "" # optional key, if you dont fill this in itll pull from the confi
 app-token = "" # also optional
 listen-channel = "" # the slack channel ID to listen to, (eg. Channel ID: C06Q284BDRT)
 ignore-numbers = ["5555", "7777", ""] # these won't be sent automatically
+ingress = "socket" # how events get here, "socket" (socket mode) or "events" (events api over http, see [events-api])
 
 [propresenter]
 host = "127.0.0.1"
@@ -13,6 +14,8 @@ password = "" # must not be blank
 batch-wait-time = 10 # how long to wait for multiple numbers before processing them
 batch-max-count = 3 # how many numbers to batch together
 expire-time = 45
+message = "" # title of the propresenter message to page with, blank to use the first one with "vk" in the title
+catalog-cache = true # remember the propresenter message list between runs, so reconnecting skips looking for the message
 # propresenter 7 decided it doesnt need to send feedback for events, 
 # so we have no way of knowing if someone presses hide, or if someone takes the screen manually.
 # so for pro7, we'll just guess
@@ -20,4 +23,30 @@ expire-time = 45
 [network] # retrieve credentials
 target = ""
 simpleauth-pass = ""
+team = "" # slack team id, only needed if the token server has more than one workspace
+token-cache-hours = 24 # fetched tokens are cached locally for this long so startup can skip the server
+
+[history]
+enabled = true # keep a history of pages in Documents/Village Kids Pager/history.sqlite3, see `python history.py report`
+
+[events-api] # only used with ingress = "events". slack must be able to reach this, eg. through a tunnel or reverse proxy
+signing-secret = "" # from the slack app's basic information page
+host = "0.0.0.0"
+port = 3000
+path = "/slack/events"
+
+[dashboard] # live view of the queue in a browser, eg. on a phone
+enabled = false
+host = "0.0.0.0" # 127.0.0.1 to only allow this computer
+port = 8089
+
+[failover] # run a second instance as a hot standby
+enabled = false
+lease-file = "" # a path both instances can reach, eg. on a shared drive
+node-name = "" # defaults to <hostname>-<process id>
+lease-time = 3 # seconds without a heartbeat before the standby takes over
+
+[debug]
+record-trace = false # record slack events and propresenter traffic to Documents/Village Kids Pager/traces, for use with replay.py
+slow-callback-ms = 100 # log a warning with the blocking code when the app is stuck for longer than this
 """
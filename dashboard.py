@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+import codec
+
+if TYPE_CHECKING:
+    from bot import Client
+
+logger = logging.getLogger("bot.dashboard")
+
+
+class StateBroadcaster:
+    """
+    Fans page and connection events out to every dashboard viewer.
+    Each event is encoded once and the same bytes are queued for every viewer. A viewer that falls too
+    far behind (eg. a phone that went to sleep) is dropped rather than holding up everyone else.
+    """
+    def __init__(self, client: Client, backlog: int = 100) -> None:
+        self.client = client
+        self.backlog = backlog
+        self.viewers: set[asyncio.Queue[bytes | None]] = set()
+        self._last_status: dict | None = None
+
+    def subscribe(self) -> asyncio.Queue[bytes | None]:
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue(self.backlog)
+        self.viewers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[bytes | None]) -> None:
+        self.viewers.discard(queue)
+
+    def publish(self, kind: str, data: dict | None = None) -> None:
+        if not self.viewers:
+            return
+
+        state = self.client.status()
+        self._last_status = self.comparable(state)
+        frame = encode(kind, {**(data or {}), "state": state})
+
+        for queue in list(self.viewers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                logger.info("Dropping a dashboard viewer that fell behind")
+                self.viewers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None) # tells the viewer's handler to hang up
+
+    def hang_up(self) -> None:
+        # ends every viewer's stream, so shutdown doesn't sit waiting on open connections
+        for queue in list(self.viewers):
+            self.viewers.discard(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    @staticmethod
+    def comparable(state: dict) -> dict:
+        return {k: v for k, v in state.items() if k != "loop_lag"}
+
+    async def task_watch_status(self, interval: float = 1.0) -> None:
+        # connection changes don't come through as events, so one watcher checks for them on behalf of every viewer
+        while True:
+            await asyncio.sleep(interval)
+            if self.viewers and self.comparable(self.client.status()) != self._last_status:
+                self.publish("status")
+
+
+def encode(kind: str, data: dict) -> bytes:
+    return f"event: {kind}\ndata: {codec.dumps(data)}\n\n".encode()
+
+
+class Dashboard:
+    """
+    Small local web dashboard so people away from the booth can watch the queue.
+    GET / serves the page, GET /events is a server-sent event stream that starts with a snapshot.
+    """
+    def __init__(self, client: Client, host: str, port: int) -> None:
+        self.client = client
+        self.host = host
+        self.port = port
+        self.broadcaster = StateBroadcaster(client)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> asyncio.Task:
+        app = web.Application()
+        app.router.add_get("/", self.index_route)
+        app.router.add_get("/events", self.events_route)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+        logger.info(f"Dashboard listening on http://{self.host}:{self.port}/")
+        return asyncio.create_task(self.broadcaster.task_watch_status())
+
+    async def index_route(self, request: web.Request) -> web.Response:
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def events_route(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await response.prepare(request)
+
+        queue = self.broadcaster.subscribe()
+        try:
+            await response.write(encode("snapshot", {"state": self.client.status()}))
+
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    frame = b": keepalive\n\n" # keeps proxies and phones from closing an idle stream
+
+                if frame is None:
+                    break
+
+                await response.write(frame)
+        except ConnectionResetError: # the viewer went away
+            pass
+        finally:
+            self.broadcaster.unsubscribe(queue)
+
+        return response
+
+    async def stop(self) -> None:
+        self.broadcaster.hang_up()
+        if self._runner:
+            await self._runner.cleanup()
+
+
+PAGE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Village Kids Pager</title>
+<style>
+  body { font-family: -apple-system, sans-serif; margin: 1em; max-width: 40em; }
+  .status span { margin-right: 1em; }
+  .ok { color: green; } .bad { color: red; }
+  #active { font-size: 2em; margin: 0.5em 0; }
+  #log { color: #666; font-size: 0.9em; }
+</style>
+</head>
+<body>
+<div class="status"><span id="slack">Slack: ?</span><span id="propres">ProPres: ?</span><span id="stream" class="bad">Offline</span></div>
+<div id="active">Active: N/A</div>
+<div>Last Number: <span id="last">N/A</span></div>
+<h3>Queued</h3>
+<ul id="queued"></ul>
+<h3>Activity</h3>
+<ul id="log"></ul>
+<script>
+function text(id, value, ok) {
+  const el = document.getElementById(id);
+  el.textContent = value;
+  if (ok !== undefined) el.className = ok ? "ok" : "bad";
+}
+
+function render(state) {
+  text("slack", "Slack: " + (state.slack ? "Connected" : "Disconnected"), state.slack);
+  const standby = state.leader === false;
+  text("propres", "ProPres: " + (standby ? "Standby" : state.propresenter ? "Connected" : "Disconnected"), standby || state.propresenter);
+  const by = (state.active_by || []).filter(n => n);
+  text("active", "Active: " + (state.active || "N/A") + (by.length ? " (" + by.join(", ") + ")" : ""));
+  text("last", state.last_number || "N/A");
+
+  const queued = document.getElementById("queued");
+  queued.replaceChildren(...state.queued.map(n => Object.assign(document.createElement("li"), {textContent: n})));
+}
+
+function log(line) {
+  const el = document.getElementById("log");
+  el.prepend(Object.assign(document.createElement("li"), {textContent: new Date().toLocaleTimeString() + " " + line}));
+  while (el.children.length > 50) el.lastChild.remove();
+}
+
+const events = new EventSource("events");
+events.onopen = () => text("stream", "Live", true);
+events.onerror = () => text("stream", "Reconnecting...", false);
+
+for (const kind of ["snapshot", "status", "queued", "shown", "cleared"]) {
+  events.addEventListener(kind, e => {
+    const data = JSON.parse(e.data);
+    render(data.state);
+    if (data.number) log(kind + " " + data.number);
+  });
+}
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import socket
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from bot import Client
+
+logger = logging.getLogger("bot.failover")
+
+
+class LeaseFailover:
+    """
+    Leader election between two (or more) pager instances through a shared lease file.
+
+    The lease file holds the current leader, when its lease expires, the leader's queue state, and an inbox.
+    The leader renews the lease every `heartbeat` seconds and writes a snapshot of its queue with it.
+    Standbys watch the lease and claim it once it expires, picking up the snapshot from the old leader.
+    Slack only delivers each event to one socket mode connection, so standbys put the events they get
+    in the inbox for the leader to handle.
+
+    Every read-modify-write of the lease happens under an flock on `<lease>.lock`, off the event loop.
+    Expiry uses wall clock time, so instances on different machines need their clocks reasonably in sync.
+    """
+    def __init__(self, client: Client, path: str, node: str | None = None, lease_time: float = 3.0) -> None:
+        self.client = client
+        self.path = path
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_time = lease_time
+        self.heartbeat = lease_time / 4
+
+        self.leader = False
+        self._outbox: list[dict] = []
+
+    def forward(self, message: dict) -> None:
+        # standby only, handed to the leader on the next heartbeat
+        self._outbox.append(message)
+
+    async def task_lease(self) -> None:
+        logger.info(f"Failover enabled as {self.node}, lease file: {self.path}")
+
+        while True:
+            snapshot = self.client.snapshot_state() if self.leader else None
+            outbox, self._outbox = self._outbox, []
+
+            try:
+                leader, state, inbox = await asyncio.to_thread(self.tick, snapshot, outbox)
+            except OSError as e:
+                logger.error("Could not access the failover lease file:", exc_info=e)
+                self._outbox = outbox + self._outbox
+                await asyncio.sleep(self.heartbeat)
+                continue
+
+            if leader and not self.leader:
+                self.leader = True
+                logger.warning(f"{self.node} is now the leader")
+                await self.client.take_over(state)
+
+            elif not leader and self.leader:
+                self.leader = False
+                logger.warning(f"{self.node} lost the lease, stepping down to standby")
+                await self.client.step_down()
+
+            for message in inbox:
+                asyncio.create_task(self.client.on_message(message))
+
+            await asyncio.sleep(self.heartbeat)
+
+    def tick(self, snapshot: dict | None, outbox: list[dict]) -> tuple[bool, dict, list[dict]]:
+        """
+        Runs in a worker thread. Returns whether we hold the lease, the replicated state, and any forwarded events.
+        """
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                lease = self.read_lease()
+                now = time.time()
+
+                owner = lease.get("owner")
+                ours = owner == self.node or owner is None or lease.get("expires", 0) < now
+
+                state: dict = lease.get("state") or {}
+                inbox: list[dict] = lease.get("inbox", [])
+
+                if ours:
+                    if owner not in (self.node, None):
+                        logger.info(f"Lease held by {owner} expired {now - lease['expires']:.1f}s ago, claiming it")
+
+                    lease = {"owner": self.node, "expires": now + self.lease_time, "state": snapshot or state, "inbox": []}
+                    self.write_lease(lease)
+                    return True, state, inbox + outbox
+
+                if outbox:
+                    lease["inbox"] = inbox + outbox
+                    self.write_lease(lease)
+
+                return False, state, []
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_lease(self) -> dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_lease(self, lease: dict) -> None:
+        tmp = f"{self.path}.{self.node}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(lease, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self.path)
@@ -0,0 +1,74 @@
+"""
+Runs the pager without the qt window or tray icon, eg. as a service on a small linux box.
+Errors go to the log instead of dialogs.
+
+usage: python headless.py [--status-port 8088]
+
+with --status-port, GET http://127.0.0.1:<port>/status returns the connection and queue state as json.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+
+from aiohttp import web
+
+import bot
+
+logger = logging.getLogger("bot.headless")
+
+
+async def status_route(request: web.Request) -> web.Response:
+    client: bot.Client = request.app["client"]
+    return web.json_response(client.status())
+
+
+async def start_status_server(client: bot.Client, port: int) -> web.AppRunner:
+    app = web.Application()
+    app["client"] = client
+    app.router.add_get("/status", status_route)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    logger.info(f"Status endpoint listening on http://127.0.0.1:{port}/status")
+    return runner
+
+
+async def serve(client: bot.Client, status_port: int | None) -> None:
+    runner = await start_status_server(client, status_port) if status_port else None
+
+    main = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, main.cancel)  # type: ignore
+
+    try:
+        await client.start()
+    except asyncio.CancelledError:
+        logger.info("Shutting down")
+    finally:
+        if runner:
+            await runner.cleanup()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the pager without a ui")
+    parser.add_argument("--status-port", type=int, default=None, help="serve /status on this port on 127.0.0.1")
+    args = parser.parse_args(argv)
+
+    client = bot.Client()
+    config = client.read_config()
+    if config is None:
+        sys.exit(1)
+
+    client.config = config
+    asyncio.run(serve(client, args.status_port))
+
+
+if __name__ == "__main__":
+    main()
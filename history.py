@@ -0,0 +1,200 @@
+"""
+Page history, stored in an sqlite database next to the config.
+
+usage: python history.py report [--db path] [--gap hours]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger("bot.history")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY, -- the queue nonce, usually the slack message ts
+    slack_ts TEXT NOT NULL,
+    number TEXT NOT NULL,
+    target TEXT,
+    queued_at REAL NOT NULL,
+    shown_at REAL,
+    cleared_at REAL
+);
+CREATE INDEX IF NOT EXISTS pages_number ON pages (number, queued_at);
+CREATE INDEX IF NOT EXISTS pages_queued ON pages (queued_at);
+"""
+
+
+class Page(NamedTuple):
+    id: str
+    slack_ts: str
+    number: str
+    target: str | None
+    queued_at: float
+    shown_at: float | None
+    cleared_at: float | None
+
+
+class ServiceReport(NamedTuple):
+    start: float
+    end: float
+    pages: int
+    avg_wait: float | None # queued -> shown
+    max_wait: float | None
+    avg_shown: float | None # shown -> cleared
+
+
+class PageHistory:
+    """
+    Records when each page was queued, shown and cleared.
+    Writes are buffered and committed in batches by `task_flush` in a worker thread, so the event loop never waits on disk.
+    Reads flush first so lookups always see the latest pages. The history view reads through its own connection,
+    so the ui never waits on a flush in progress.
+    """
+    def __init__(self, path: str, flush_interval: float = 1.0) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending: collections.deque[tuple[str, tuple]] = collections.deque() # appended on the event loop, drained by flush
+        self._lock = threading.Lock()
+        self._view_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._view_db = sqlite3.connect(path, check_same_thread=False) # wal lets this read while the other connection writes
+
+    # writes
+
+    def queued(self, page_id: str, slack_ts: str, number: str, target: str | None) -> None:
+        self._pending.append((
+            "INSERT OR REPLACE INTO pages (id, slack_ts, number, target, queued_at) VALUES (?, ?, ?, ?, ?)",
+            (page_id, slack_ts, number, target, time.time()),
+        ))
+
+    def shown(self, page_id: str) -> None:
+        self._pending.append(("UPDATE pages SET shown_at = ? WHERE id = ?", (time.time(), page_id)))
+
+    def cleared(self, page_id: str) -> None:
+        self._pending.append(("UPDATE pages SET cleared_at = ? WHERE id = ?", (time.time(), page_id)))
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+
+            batch = [self._pending.popleft() for _ in range(len(self._pending))]
+            with self._db:
+                for sql, params in batch:
+                    self._db.execute(sql, params)
+
+    async def task_flush(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                if self._pending:
+                    try:
+                        await asyncio.to_thread(self.flush)
+                    except sqlite3.Error as e:
+                        logger.error("Failed to write page history:", exc_info=e)
+        finally:
+            self.flush()
+
+    # reads, these block so call them from a thread when on the event loop
+
+    def recent_numbers(self, count: int) -> list[str]:
+        """
+        The last `count` distinct numbers paged, newest first.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT number FROM pages GROUP BY number ORDER BY MAX(queued_at) DESC LIMIT ?", (count,)
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def page_before(self, before: float | None, limit: int) -> list[Page]:
+        """
+        Newest-first pages queued before `before`, for loading the history view a chunk at a time.
+        """
+        with self._view_lock:
+            if before is None:
+                rows = self._view_db.execute("SELECT * FROM pages ORDER BY queued_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._view_db.execute(
+                    "SELECT * FROM pages WHERE queued_at < ? ORDER BY queued_at DESC LIMIT ?", (before, limit)
+                ).fetchall()
+
+        return [Page(*row) for row in rows]
+
+    def service_report(self, gap: float = 2 * 3600) -> list[ServiceReport]:
+        """
+        Latency per service. A service is a run of pages with no more than `gap` seconds between them.
+        """
+        self.flush()
+        reports: list[ServiceReport] = []
+        current: list[tuple[float, float | None, float | None]] = []
+
+        def close() -> None:
+            waits = [shown - queued for queued, shown, _ in current if shown is not None]
+            on_screen = [cleared - shown for _, shown, cleared in current if shown is not None and cleared is not None]
+            reports.append(ServiceReport(
+                current[0][0],
+                current[-1][0],
+                len(current),
+                sum(waits) / len(waits) if waits else None,
+                max(waits) if waits else None,
+                sum(on_screen) / len(on_screen) if on_screen else None,
+            ))
+
+        with self._lock:
+            for row in self._db.execute("SELECT queued_at, shown_at, cleared_at FROM pages ORDER BY queued_at"):
+                if current and row[0] - current[-1][0] > gap:
+                    close()
+                    current = []
+
+                current.append(row)
+
+        if current:
+            close()
+
+        return reports
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+        self._view_db.close()
+
+
+def default_path() -> str:
+    return os.environ["HOME"] + "/Documents/Village Kids Pager/history.sqlite3"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Page history reports")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--db", default=default_path())
+    parser.add_argument("--gap", type=float, default=2, help="hours between pages that start a new service")
+    args = parser.parse_args(argv)
+
+    history = PageHistory(args.db)
+
+    def fmt(seconds: float | None) -> str:
+        return f"{seconds:.1f}s" if seconds is not None else "-"
+
+    print(f"{'service':<17} {'pages':>5} {'avg wait':>9} {'max wait':>9} {'avg shown':>10}")
+    for report in history.service_report(args.gap * 3600):
+        start = time.strftime("%Y-%m-%d %H:%M", time.localtime(report.start))
+        print(f"{start:<17} {report.pages:>5} {fmt(report.avg_wait):>9} {fmt(report.max_wait):>9} {fmt(report.avg_shown):>10}")
+
+
+if __name__ == "__main__":
+    main()
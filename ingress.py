@@ -0,0 +1,161 @@
+"""
+Slack Events API receiver, an alternative to socket mode for sites where the websocket keeps going stale.
+
+to post signed test events at a running receiver:
+usage: python ingress.py post <url> <signing secret> <channel> <text> [<text> ...]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import aiohttp
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from bot import Client
+
+logger = logging.getLogger("bot.ingress")
+
+MAX_CLOCK_SKEW = 60 * 5 # slack's recommendation for rejecting replayed requests
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    base = b"v0:" + timestamp.encode() + b":" + body
+    return "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+
+
+class EventsApiReceiver:
+    """
+    Receives slack events over http. Requests are verified against the signing secret and acknowledged
+    straight away, the event itself is handled in its own task so slack never waits on propresenter.
+    Slack retries anything it doesn't get a 200 for in 3 seconds, retries of events we've already seen are dropped.
+    """
+    def __init__(self, client: Client, signing_secret: str, host: str, port: int, path: str = "/slack/events") -> None:
+        self.client = client
+        self.signing_secret = signing_secret
+        self.host = host
+        self.port = port
+        self.path = path
+
+        self.running = False
+        self._seen: collections.OrderedDict[str, None] = collections.OrderedDict()
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post(self.path, self.events_route)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+        self.running = True
+        logger.info(f"Listening for slack events on http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._runner:
+            await self._runner.cleanup()
+
+    def verify(self, request: web.Request, body: bytes) -> bool:
+        timestamp = request.headers.get("X-Slack-Request-Timestamp", "")
+        signature = request.headers.get("X-Slack-Signature", "")
+
+        try:
+            if abs(time.time() - int(timestamp)) > MAX_CLOCK_SKEW:
+                return False
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(sign(self.signing_secret, timestamp, body), signature)
+
+    def seen(self, event_id: str) -> bool:
+        if event_id in self._seen:
+            return True
+
+        self._seen[event_id] = None
+        if len(self._seen) > 1000:
+            self._seen.popitem(last=False)
+
+        return False
+
+    async def events_route(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not self.verify(request, body):
+            logger.warning("Rejected a slack event with an invalid signature")
+            return web.Response(status=401)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logger.warning("Rejected a signed slack event that isn't json")
+            return web.Response(status=400)
+
+        if payload.get("type") == "url_verification": # sent once when the request url is set in the slack app settings
+            return web.json_response({"challenge": payload["challenge"]})
+
+        if payload.get("type") != "event_callback":
+            return web.Response(status=200)
+
+        event_id = payload.get("event_id")
+        if event_id and self.seen(event_id): # without an id there's nothing to tell a retry apart by
+            logger.debug(f"Ignoring retry {request.headers.get('X-Slack-Retry-Num')} of {event_id} ({request.headers.get('X-Slack-Retry-Reason')})")
+            return web.Response(status=200)
+
+        event = payload.get("event", {})
+        if event.get("type") == "message":
+            asyncio.create_task(self.client.on_message(event))
+        else:
+            asyncio.create_task(self.client.on_metadata_event(event))
+
+        return web.Response(status=200)
+
+
+async def post_events(url: str, secret: str, channel: str, texts: list[str]) -> None:
+    """
+    Stands in for slack, posting signed message events the way the events api does.
+    """
+    async with aiohttp.ClientSession() as session:
+        for i, text in enumerate(texts):
+            now = time.time()
+            payload = {
+                "type": "event_callback",
+                "event_id": f"Ev{int(now * 1000)}{i}",
+                "event": {"type": "message", "channel": channel, "text": text, "ts": f"{now:.6f}"},
+            }
+            body = json.dumps(payload).encode()
+            timestamp = str(int(now))
+
+            headers = {
+                "Content-Type": "application/json",
+                "X-Slack-Request-Timestamp": timestamp,
+                "X-Slack-Signature": sign(secret, timestamp, body),
+            }
+
+            start = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as resp:
+                print(f"{text!r}: {resp.status} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Post signed slack events at a receiver")
+    parser.add_argument("command", choices=["post"])
+    parser.add_argument("url")
+    parser.add_argument("secret")
+    parser.add_argument("channel")
+    parser.add_argument("texts", nargs="+")
+    args = parser.parse_args(argv)
+
+    asyncio.run(post_events(args.url, args.secret, args.channel, args.texts))
+
+
+if __name__ == "__main__":
+    main()
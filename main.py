@@ -1,10 +1,10 @@
+import bot # first, so bot.STARTED includes the qt import below
 import sys
 import threading
 from PySide6.QtWidgets import QApplication
 from ui.mainwindow import MainWindow
 from ui.widget import WidgetMenu
 
-import bot
 client = bot.Client()
 
 app = QApplication(sys.argv)
@@ -12,6 +12,7 @@ app.setQuitOnLastWindowClosed(False)
 
 window = MainWindow(client, app)
 client.window = window
+client.log_phase("window created")
 thread = threading.Thread(target=client.run, args=(window,), name="Asyncio Thread", daemon=True)
 thread.start()
 app.exec()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot import Client
+
+logger = logging.getLogger("bot.monitor")
+
+ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+class LoopMonitor:
+    """
+    Watches the health of the asyncio thread.
+
+    A task on the loop measures how late its own wakeups are (scheduling lag), and a watchdog thread
+    checks that the task is still ticking. If the loop is stuck for longer than `slow_callback`
+    the watchdog grabs the loop thread's stack and logs which coroutine is blocking it.
+    The latest numbers are plain attributes so the ui poll thread can read them directly.
+    """
+    def __init__(self, client: Client, interval: float = 0.25, slow_callback: float = 0.1) -> None:
+        self.client = client
+        self.interval = interval
+        self.slow_callback = slow_callback
+
+        self.lag: float = 0.0
+        self.max_lag: float = 0.0 # since the last report
+        self.task_count: int = 0
+        self.client_task_count: int = 0
+
+        self._loop_thread: int | None = None
+        self._heartbeat = time.monotonic()
+        self._last_report = time.monotonic()
+
+    def start(self) -> asyncio.Task:
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+
+        threading.Thread(target=self.watchdog, name="Loop Watchdog", daemon=True).start()
+        return asyncio.create_task(self.task_monitor())
+
+    async def task_monitor(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+
+            self.lag = max(0.0, loop.time() - before - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            if self.lag >= self.slow_callback:
+                logger.warning(f"asyncio loop lag: {self.lag * 1000:.0f}ms")
+
+            # finished tasks (eg. old propresenter pumps after a reconnect) would otherwise pile up here forever
+            self.client._tasks[:] = [t for t in self.client._tasks if not t.done()]
+            self.client_task_count = len(self.client._tasks)
+            self.task_count = len(asyncio.all_tasks(loop))
+
+            if self._heartbeat - self._last_report >= 60:
+                logger.debug(f"loop health: max lag {self.max_lag * 1000:.0f}ms, {self.task_count} tasks ({self.client_task_count} tracked)")
+                self._last_report = self._heartbeat
+                self.max_lag = 0.0
+
+    def watchdog(self) -> None:
+        reported = 0.0 # heartbeat we last reported a stall for, so each stall is only logged once
+
+        while True:
+            time.sleep(self.slow_callback / 2)
+
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.slow_callback or heartbeat == reported:
+                continue
+
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)  # type: ignore
+            if frame is None:
+                continue
+
+            stack = traceback.extract_stack(frame)
+            logger.warning(
+                f"asyncio loop blocked for {stalled * 1000:.0f}ms+ in {self.blocking_coroutine(stack)}\n"
+                + "".join(stack.format()[-5:])
+            )
+
+    @staticmethod
+    def blocking_coroutine(stack: traceback.StackSummary) -> str:
+        # the first frame outside asyncio after the loop's Handle._run is the task that's holding the loop,
+        # the last frame is whatever it's actually stuck in
+        running = False
+        for entry in stack:
+            if entry.filename.startswith(ASYNCIO_DIR):
+                running = running or entry.name == "_run"
+                continue
+
+            if running:
+                innermost = stack[-1]
+                return f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno}), currently in {innermost.name} ({os.path.basename(innermost.filename)}:{innermost.lineno})"
+
+        return "<unknown>"
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark of the propresenter websocket pump.
+
+usage: python prop_bench.py [--frames 50000] [--backend orjson|json]
+
+starts a fake propresenter on a random local port that blasts a mix of pro6 style frames
+(messageSend / messageHide echoes, slide triggers, message lists) at a bot.Client once it's authenticated,
+and reports how many frames/second the pump gets through for each json backend.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+
+from aiohttp import web
+
+import bot
+import codec
+
+MESSAGES = [{"messageTitle": f"Message {i}", "messageComponents": ["Text ", f"${{Token{i}}}"]} for i in range(20)]
+MESSAGES.append({"messageTitle": "VK Number", "messageComponents": ["VK: ", "${Number}"]})
+
+MIX = [
+    {"action": "messageSend", "messageIndex": 20, "messageKeys": ["Number"], "messageValues": ["1234"]},
+    {"action": "presentationTriggerIndex", "slideIndex": 3, "presentationPath": "/Users/booth/Library/Sermon.pro6"},
+    {"action": "messageHide", "messageIndex": 20},
+    {"action": "clearText"},
+    {"action": "messageRequest", "messages": MESSAGES},
+]
+
+
+class FakeProPresenter:
+    def __init__(self, frames: int) -> None:
+        self.frames = frames
+        self.port = 0
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        encoded = [codec.dumps(frame) for frame in MIX] # encoded up front so only the client side is measured
+        async for msg in ws:
+            payload = msg.json()
+            if payload["action"] == "authenticate":
+                await ws.send_json({"action": "authenticate", "authenticated": 1, "error": "", "majorVersion": 6, "minorVersion": 0})
+
+            elif payload["action"] == "messageRequest":
+                await ws.send_json({"action": "messageRequest", "messages": MESSAGES})
+
+            elif payload["action"] == "benchStart":
+                for i in range(self.frames):
+                    await ws.send_str(encoded[i % len(encoded)])
+
+                await ws.send_str('{"action":"benchDone"}')
+
+        return ws
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/remote", self.handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+async def run(frames: int, backend: str) -> None:
+    codec.use(backend)
+
+    fake = FakeProPresenter(frames)
+    await fake.start()
+
+    client = bot.Client()
+    client.config = {
+        "bot": {},
+        "propresenter": {"host": "127.0.0.1", "port": fake.port, "password": "bench", "batch-wait-time": 10, "batch-max-count": 3, "expire-time": 45, "catalog-cache": False},
+        "history": {"enabled": False},
+        "debug": {"slow-callback-ms": 60_000}, # the fake shares the loop, so the watchdog would flag every burst
+    }
+    client.write_config = lambda: None  # type: ignore # never touch the real config file
+
+    done = asyncio.Event()
+    async def bench_done(msg: dict, raw: str) -> None:
+        done.set()
+
+    client.prop_handlers["benchDone"] = bench_done
+
+    await client.setup_asyncio()
+    await client.setup_prop_connection()
+    await client.prop_ready.wait()
+
+    start = time.perf_counter()
+    await client.prop_send({"action": "benchStart"})
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    print(f"{backend:<7} {frames / elapsed:>9.0f} frames/s  ({frames} frames in {elapsed:.2f}s)")
+
+    for task in client._tasks:
+        task.cancel()
+
+    if client.prop_ws:
+        await client.prop_ws.close()
+
+    await fake.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the propresenter websocket pump")
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--backend", choices=["orjson", "json"], action="append", help="defaults to every installed backend")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("bot").setLevel(logging.WARNING) # debug logging every frame would be all we measure
+
+    backends = args.backend or (["orjson", "json"] if codec.orjson is not None else ["json"])
+    for backend in backends:
+        asyncio.run(run(args.frames, backend))
+
+
+if __name__ == "__main__":
+    main()
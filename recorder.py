@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, TypedDict
+
+logger = logging.getLogger("bot.recorder")
+
+# trace format: one json object per line.
+# the first line is a header ({"kind": "header", ...}) with the config the bot was running with,
+# every line after that is {"t": <seconds since recording started>, "kind": <kind>, "data": <payload>}
+# kinds:
+#   slack     - an incoming slack event, before any filtering
+#   prop-recv - a frame received from propresenter
+#   prop-send - a frame sent to propresenter
+
+TRACE_VERSION = 1
+REDACTED_KEYS = ("password",)
+REDACTED_SUFFIXES = ("-token", "-secret", "-pass") # bot-token, app-token, signing-secret, simpleauth-pass and whatever comes next
+
+
+class TraceRecord(TypedDict):
+    t: float
+    kind: str
+    data: Any
+
+
+def redact(payload: Any) -> Any:
+    if isinstance(payload, dict):
+        return {k: ("<redacted>" if secret(k) else redact(v)) for k, v in payload.items()}
+
+    return payload
+
+
+def secret(key: str) -> bool:
+    return key in REDACTED_KEYS or key.endswith(REDACTED_SUFFIXES)
+
+
+class TraceRecorder:
+    """
+    Opt-in recorder for slack events and propresenter frames, used to reproduce incidents with replay.py.
+    Writes are buffered in memory and flushed by a background task so the event loop never waits on disk.
+    """
+    def __init__(self, path: str, flush_interval: float = 1.0) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer: list[str] = []
+        self._started = time.monotonic()
+        self._file = None
+
+    def start(self, config: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "w")
+        self._started = time.monotonic()
+
+        header = {"kind": "header", "version": TRACE_VERSION, "wall": time.time(), "config": redact(config)}
+        self._buffer.append(json.dumps(header, separators=(",", ":")))
+        logger.info(f"Recording trace to {self.path}")
+
+    def record(self, kind: str, data: Any) -> None:
+        if self._file is None:
+            return
+
+        line = {"t": round(time.monotonic() - self._started, 4), "kind": kind, "data": redact(data)}
+        self._buffer.append(json.dumps(line, separators=(",", ":")))
+
+    def flush(self) -> None:
+        if self._file is None or not self._buffer:
+            return
+
+        lines, self._buffer = self._buffer, []
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    async def task_flush(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                if self._buffer:
+                    await asyncio.to_thread(self.flush)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+def read_trace(path: str) -> tuple[dict, list[TraceRecord]]:
+    header: dict = {}
+    records: list[TraceRecord] = []
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            entry = json.loads(line)
+            if entry.get("kind") == "header":
+                header = entry
+                continue
+
+            records.append(entry)
+
+    return header, records
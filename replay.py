@@ -0,0 +1,213 @@
+"""
+Replays a trace recorded with `[debug] record-trace = true` against a stand-in propresenter.
+
+usage: python replay.py <trace.jsonl> [--speed 10] [--pro6]
+
+slack events are fed into Client.on_message at their recorded offsets (divided by --speed),
+and the bot's batch/expire timers are scaled by the same factor so the shape of the load is preserved.
+nothing is sent to slack; reactions are collected and reported with their timings.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import logging
+import os
+import tempfile
+import time
+
+from aiohttp import web
+
+import bot
+from history import PageHistory
+from recorder import read_trace
+
+logger = logging.getLogger("bot.replay")
+
+
+class StandInProPresenter:
+    """
+    Minimal propresenter remote websocket. Accepts any password, answers messageRequest with the
+    message list from the trace (or a default VK message), and logs every frame the bot sends.
+    pro6 mode echoes messageSend/messageHide back like pro6 did.
+    """
+    def __init__(self, message_list: list[dict] | None, pro6: bool) -> None:
+        self.message_list = message_list or [{"messageTitle": "VK Number", "messageComponents": ["VK: ", "${Number}"]}]
+        self.pro6 = pro6
+        self.received: list[tuple[float, dict]] = []
+        self.port: int | None = None
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async for frame in ws:
+            msg = frame.json()
+            self.received.append((time.monotonic(), msg))
+
+            if msg["action"] == "authenticate":
+                await ws.send_json({"action": "authenticate", "authenticated": 1, "error": "", "majorVersion": 7, "minorVersion": 0})
+
+            elif msg["action"] == "messageRequest":
+                await ws.send_json({"action": "messageRequest", "messages": self.message_list})
+
+            elif self.pro6 and msg["action"] in ("messageSend", "messageHide"):
+                await ws.send_json(msg)
+
+        return ws
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/remote", self.handle)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class ReplaySlackClient:
+    """
+    Stands in for the slack web client, recording reactions instead of sending them.
+    """
+    def __init__(self) -> None:
+        self.reactions: list[tuple[float, str, str]] = []
+
+    async def reactions_add(self, *, channel: str, name: str, timestamp: str) -> dict:
+        self.reactions.append((time.monotonic(), timestamp, name))
+        return {"ok": True}
+
+
+def build_config(header: dict, speed: float) -> dict:
+    config = copy.deepcopy(header.get("config") or {})
+    config.setdefault("bot", {})
+    config.setdefault("propresenter", {})
+
+    prop = config["propresenter"]
+    prop["password"] = "replay"
+    prop["batch-wait-time"] = prop.get("batch-wait-time", 10) / speed
+    prop["batch-max-count"] = prop.get("batch-max-count", 3)
+    prop["expire-time"] = prop.get("expire-time", 45) / speed
+    prop["catalog-cache"] = False # the stand-in is a different library every run
+
+    config.pop("debug", None) # don't record the replay
+    config["history"] = {"enabled": False} # replay() gives it a throwaway history instead of the real one
+    return config
+
+
+async def replay(path: str, speed: float, pro6: bool | None) -> None:
+    header, records = read_trace(path)
+    events = [r for r in records if r["kind"] == "slack"]
+
+    message_list = None
+    for record in records:
+        if record["kind"] == "prop-recv" and record["data"].get("action") == "messageRequest":
+            message_list = record["data"]["messages"]
+            break
+
+    if pro6 is None: # pro6 echoes sends back to us, pro7 doesn't
+        pro6 = any(r["kind"] == "prop-recv" and r["data"].get("action") == "messageSend" for r in records)
+
+    stand_in = StandInProPresenter(message_list, pro6)
+    await stand_in.start()
+
+    client = bot.Client()
+    client.config = build_config(header, speed)
+    client.config["propresenter"]["host"] = "127.0.0.1"
+    client.config["propresenter"]["port"] = stand_in.port
+    client.write_config = lambda: None  # type: ignore # never touch the real config file
+    slack = ReplaySlackClient()
+    client.client = slack  # type: ignore
+
+    await client.setup_asyncio()
+
+    # "repeat" and "repeat last 3" look numbers up in the history, so they get one that starts empty like the trace did
+    history_dir = tempfile.TemporaryDirectory()
+    client.history = PageHistory(os.path.join(history_dir.name, "history.sqlite3"), flush_interval=1.0 / speed)
+    client._tasks.append(asyncio.create_task(client.history.task_flush()))
+
+    await client.setup_prop_connection()
+
+    while client.prop_message_index is None:
+        await asyncio.sleep(0.01)
+
+    logger.info(f"replaying {len(events)} slack events at {speed}x against stand-in propresenter on port {stand_in.port}")
+
+    fed: dict[str, float] = {}
+    handlers = []
+    start = time.monotonic()
+    t0 = events[0]["t"] if events else 0
+
+    for event in events:
+        delay = start + (event["t"] - t0) / speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if "ts" in event["data"]:
+            fed[event["data"]["ts"]] = time.monotonic()
+        handlers.append(asyncio.create_task(client.on_message(event["data"])))
+
+    # one event the bot chokes on (eg. a message_deleted without text) shouldn't cost the whole report
+    results = await asyncio.gather(*handlers, return_exceptions=True)
+    elapsed = time.monotonic() - start
+
+    for event, result in zip(events, results):
+        if isinstance(result, Exception):
+            logger.warning(f"event {event['data'].get('ts')} ({event['data'].get('subtype', 'message')}) failed: {result!r}")
+
+    report(fed, slack.reactions, stand_in.received, speed, elapsed)
+
+    for task in client._tasks:
+        task.cancel()
+
+    await asyncio.gather(*client._tasks, return_exceptions=True)
+    await asyncio.to_thread(client.history.close)
+    await asyncio.to_thread(history_dir.cleanup)
+
+    if client.prop_ws:
+        await client.prop_ws.close()
+
+    await stand_in.stop()
+
+
+def report(fed: dict[str, float], reactions: list[tuple[float, str, str]], received: list[tuple[float, dict]], speed: float, elapsed: float) -> None:
+    # latencies are scaled back up by speed so they're comparable with a live sunday
+    shown: dict[str, float] = {}
+    cleared: dict[str, float] = {}
+
+    for at, ts, name in reactions:
+        if name == "calling":
+            shown[ts] = at
+        elif name == "thumbsup" and ts in fed:
+            cleared[ts] = at
+
+    print(f"{'ts':<20} {'shown after':>12} {'cleared after':>14}")
+    for ts, at in fed.items():
+        s = f"{(shown[ts] - at) * speed:.2f}s" if ts in shown else "-"
+        c = f"{(cleared[ts] - at) * speed:.2f}s" if ts in cleared else "-"
+        print(f"{ts:<20} {s:>12} {c:>14}")
+
+    sends = sum(1 for _, msg in received if msg["action"] == "messageSend")
+    print(f"\n{len(fed)} events, {sends} messageSend frames, {len(reactions)} reactions in {elapsed:.2f}s ({elapsed * speed:.2f}s at 1x)")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded pager trace against a stand-in propresenter")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, eg. 10 for 10x")
+    parser.add_argument("--pro6", action="store_true", default=None, help="echo messageSend/messageHide like pro6 (auto-detected from the trace otherwise)")
+    args = parser.parse_args(argv)
+
+    asyncio.run(replay(args.trace, args.speed, args.pro6))
+
+
+if __name__ == "__main__":
+    main()
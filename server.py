@@ -1,73 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
 import os
 import aiohttp
 from aiohttp import web
 import toml
 import yarl
 
-with open("server-config.toml") as f:
-    config = toml.loads(f.read())
+import codec
+
+logger = logging.getLogger("server")
+
+STORE_FILE = "tokens.json"
+
+
+class TokenStore:
+    """
+    Bot tokens per slack team, kept in memory and written through to a json file.
+    Writes go to a temp file that replaces the store, so a crash mid-write never leaves it half written.
+    """
+    def __init__(self, path: str, app_token: str) -> None:
+        self.path = path
+        self.app_token = app_token # part of every response, so part of every etag
+        self.teams: dict[str, dict] = {}
+        self._write_lock = asyncio.Lock()
+
+    def load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.teams = json.load(f)
+
+        elif os.path.exists(".live-token"): # tokens from before the store existed
+            with open(".live-token") as f:
+                token = f.read().strip()
+
+            if token:
+                self.teams["default"] = {"team": "default", "bot-token": token}
+
+        for entry in self.teams.values():
+            entry["etag"] = etag(self.payload(entry))
+
+    def get(self, team_id: str | None) -> dict | None:
+        if team_id is None:
+            # single workspace setups don't need to say which team they are
+            return next(iter(self.teams.values())) if len(self.teams) == 1 else None
+
+        return self.teams.get(team_id)
+
+    async def put(self, team_id: str, team: str, token: str) -> None:
+        entry = {"team": team, "bot-token": token}
+        entry["etag"] = etag(self.payload(entry))
+        self.teams[team_id] = entry
+
+        async with self._write_lock:
+            await asyncio.to_thread(self.write, json.dumps(self.teams, indent=2))
+
+    def payload(self, entry: dict) -> dict:
+        # what /vk/fetch sends back for a team
+        return {"app-token": self.app_token, "bot-token": entry["bot-token"], "team": entry["team"]}
+
+    def write(self, data: str) -> None:
+        tmp = self.path + ".tmp"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self.path)
+
+
+def etag(payload: dict) -> str:
+    return '"' + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32] + '"'
 
-OAUTH_URL = f"https://slack.com/oauth/v2/authorize?client_id={config['client-id']}&scope=channels:history,reactions:write&user_scope="
 
 async def route(request: web.Request) -> web.Response:
+    config = request.app["config"]
     code = request.query.get("code")
     if not code:
-        raise web.HTTPTemporaryRedirect(OAUTH_URL) # redirect back to the oauth url, which will direct back to here with the temp token
-    
-    async with aiohttp.ClientSession() as session:
-        url = yarl.URL("https://api.slack.com/api/oauth.v2.access").with_query({
-            "client_id": config["client-id"],
-            "client_secret": config["client-secret"],
-            "code": code,
-            "grant_type": "authorization_code"
-        })
-
-        async with session.post(url) as resp: # exchange temp token for access token
-            if resp.status != 200:
-                return web.Response(body=f"slack error: {await resp.text()}", status=500) # lazy cop out en lieu of actual error handling...
-            
-            data = await resp.json()
-            if not data["ok"]:
-                return web.Response(body=f"slack error: {data}", status=500)
-            
-            team = data["team"]["name"]
-            token = data["access_token"]
-
-            with open("tokens.txt", mode="a") as f:
-                f.write(f"{team}: {token}\n")
-            
-            with open(".live-token", "w") as f: # janky but its fine
-                f.write(token)
-            
-            app["token"] = token
-    
-    return web.Response(body=f"Access token for {team} is: {token}", status=200)
+        raise web.HTTPTemporaryRedirect(request.app["oauth_url"]) # redirect back to the oauth url, which will direct back to here with the temp token
+
+    url = yarl.URL("https://api.slack.com/api/oauth.v2.access").with_query({
+        "client_id": config["client-id"],
+        "client_secret": config["client-secret"],
+        "code": code,
+        "grant_type": "authorization_code"
+    })
+
+    async with request.app["session"].post(url) as resp: # exchange temp token for access token
+        if resp.status != 200:
+            return web.Response(body=f"slack error: {await resp.text()}", status=500) # lazy cop out en lieu of actual error handling...
+
+        data = await resp.json(loads=codec.loads)
+        if not data["ok"]:
+            return web.Response(body=f"slack error: {data}", status=500)
+
+    team_id = data["team"]["id"]
+    team = data["team"]["name"]
+    token = data["access_token"]
+
+    await request.app["store"].put(team_id, team, token)
+    logger.info(f"Stored token for {team} ({team_id})")
+
+    return web.Response(body=f"Access token for {team} ({team_id}) is: {token}", status=200)
+
 
 async def fetcher_route(request: web.Request) -> web.Response:
+    config = request.app["config"]
     auth = request.headers.get("Authorization")
     if not auth or auth != config["simpleauth-pass"]:
         return web.Response(status=401)
 
-    if not app["token"]:
-        return web.Response(status=400, body=OAUTH_URL)
-    
-    payload = {
-        "app-token": config['app-token'],
-        "bot-token": app['token'],
-    }
-    
-    return web.json_response(payload)
+    store: TokenStore = request.app["store"]
+    team_id = request.query.get("team")
+    if team_id is None and len(store.teams) > 1:
+        return web.Response(status=400, body="more than one team is authorized, pass ?team=<team id>: " + ", ".join(store.teams))
+
+    entry = store.get(team_id)
+    if entry is None:
+        return web.Response(status=400, body=request.app["oauth_url"])
+
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == entry["etag"]:
+        return web.Response(status=304, headers=headers)
+
+    return web.json_response(store.payload(entry), headers=headers, dumps=codec.dumps)
+
+
+async def client_session(app: web.Application):
+    # one session for every oauth exchange instead of a new connection pool per request
+    app["session"] = aiohttp.ClientSession()
+    yield
+    await app["session"].close()
+
+
+def make_app(config: dict, store_path: str = STORE_FILE) -> web.Application:
+    app = web.Application()
+    app["config"] = config
+    app["oauth_url"] = f"https://slack.com/oauth/v2/authorize?client_id={config['client-id']}&scope=channels:history,channels:read,reactions:write,users:read&user_scope="
+
+    app["store"] = TokenStore(store_path, config["app-token"])
+    app["store"].load()
 
-app = web.Application()
-app["token"] = None
+    app.cleanup_ctx.append(client_session)
+    app.router.add_get("/vk/oauth", route)
+    app.router.add_get("/vk/fetch", fetcher_route)
+    return app
 
-if os.path.exists(".live-token"): # le jank
-    with open(".live-token") as __f:
-        app["token"] = __f.read().strip()
 
-    del __f
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
 
-app.router.add_get("/vk/oauth", route)
-app.router.add_get("/vk/fetch", fetcher_route)
+    with open("server-config.toml") as f:
+        config = toml.loads(f.read())
 
-web.run_app(app, port=config["port"]) # proxied via nginx for TLS (required for oauth, unless the server is on 127.0.0.1)
\ No newline at end of file
+    web.run_app(make_app(config), port=config["port"]) # proxied via nginx for TLS (required for oauth, unless the server is on 127.0.0.1)
@@ -0,0 +1,97 @@
+"""
+Local load test for the token server's /vk/fetch route.
+
+usage: python server_loadtest.py [--concurrency 50] [--duration 5] [--teams 20]
+
+starts server.make_app on a random local port with a throwaway token store, then hammers /vk/fetch
+with full fetches and with If-None-Match revalidations, and reports requests/second for each.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from server import make_app
+
+CONFIG = {
+    "client-id": "loadtest",
+    "client-secret": "loadtest",
+    "app-token": "xapp-loadtest",
+    "simpleauth-pass": "loadtest",
+}
+
+
+async def worker(session: aiohttp.ClientSession, url: str, teams: list[str], etags: dict[str, str], revalidate: bool, until: float, latencies: list[float], statuses: dict[int, int]) -> None:
+    while time.perf_counter() < until:
+        team = random.choice(teams)
+        headers = {"Authorization": CONFIG["simpleauth-pass"]}
+        if revalidate:
+            headers["If-None-Match"] = etags[team]
+
+        start = time.perf_counter()
+        async with session.get(url, params={"team": team}, headers=headers) as resp:
+            await resp.read()
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(concurrency: int, duration: float, team_count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(CONFIG, os.path.join(tmp, "tokens.json"))
+        teams = [f"T{i:08d}" for i in range(team_count)]
+        for team in teams:
+            await app["store"].put(team, f"team {team}", f"xoxb-{team}")
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        url = f"http://127.0.0.1:{port}/vk/fetch"
+
+        etags = {team: app["store"].get(team)["etag"] for team in teams}
+        connector = aiohttp.TCPConnector(limit=concurrency)
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for revalidate in (False, True):
+                latencies: list[float] = []
+                statuses: dict[int, int] = {}
+                until = time.perf_counter() + duration
+
+                await asyncio.gather(*(
+                    worker(session, url, teams, etags, revalidate, until, latencies, statuses) for _ in range(concurrency)
+                ))
+
+                latencies.sort()
+                name = "revalidate (304)" if revalidate else "full fetch (200)"
+                print(
+                    f"{name:<17} {len(latencies) / duration:>8.0f} req/s"
+                    f"  p50 {statistics.median(latencies) * 1000:.2f}ms"
+                    f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms"
+                    f"  statuses {statuses}"
+                )
+
+        await runner.cleanup()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the token server")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--teams", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    asyncio.run(run(args.concurrency, args.duration, args.teams))
+
+
+if __name__ == "__main__":
+    main()
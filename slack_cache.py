@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from slack_sdk.web.async_client import AsyncWebClient
+    from bot import Channel
+
+logger = logging.getLogger("bot.slack_cache")
+
+# slack events that change cached metadata -> the SlackMetadataCache method that handles them
+METADATA_EVENTS = {
+    "channel_rename": "on_channel_rename",
+    "channel_archive": "on_channel_gone",
+    "channel_deleted": "on_channel_gone",
+    "user_change": "on_user_change",
+}
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A dict whose entries expire after `ttl` seconds, evicting the least recently used entry past `max_size`.
+    """
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: collections.OrderedDict[K, tuple[float, V]] = collections.OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def peek(self, key: K) -> V | None:
+        # like get, but never touches the ordering, so other threads can read
+        entry = self._data.get(key)
+        return entry[1] if entry is not None else None
+
+    def pop(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def values(self) -> list[V]:
+        now = time.monotonic()
+        return [value for expires, value in list(self._data.values()) if expires >= now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SlackMetadataCache:
+    """
+    Channel and user profile cache, so the ui can show channel names and who asked for a page without an api call each time.
+    Everything is prefetched in bulk at startup, kept up to date by channel_rename / user_change events,
+    and refetched once it expires. Concurrent lookups for the same user share one users.info call.
+    """
+    def __init__(self, ttl: float = 3600, max_users: int = 5000) -> None:
+        self.client: AsyncWebClient | None = None
+        self.channels: TTLCache[str, Channel] = TTLCache(ttl, 1000)
+        self.users: TTLCache[str, dict] = TTLCache(ttl, max_users)
+
+        self._channels_fresh_until = 0.0
+        self._channels_ttl = ttl
+        self._inflight: dict[str, asyncio.Future[dict | None]] = {}
+        self._users_disabled = False # the app might not have users:read
+
+    async def prefetch(self) -> None:
+        await asyncio.gather(self.fetch_channels(), self.fetch_users())
+
+    async def task_refresh(self) -> None:
+        # channels only come in bulk and the ui reads them straight from the cache, so relist them a minute before they expire
+        while True:
+            await asyncio.sleep(max(self._channels_fresh_until - time.monotonic() - 60, 60))
+            try:
+                await self.fetch_channels()
+            except Exception as e: # offline etc, try again in a minute
+                logger.warning(f"Could not refresh the channel list: {e}")
+
+    async def fetch_channels(self) -> list[Channel]:
+        from slack_sdk.errors import SlackApiError
+
+        if self.client is None:
+            return []
+
+        channels: list[Channel] = []
+        cursor = None
+        try:
+            while True:
+                resp = await self.client.users_conversations(exclude_archived=True, limit=200, cursor=cursor)
+                channels.extend({"name": x["name"], "id": x["id"]} for x in resp["channels"] if x.get("is_channel"))
+
+                cursor = resp.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        except SlackApiError as e:
+            logger.warning(f"Could not fetch channel list: {e.response['error']}")
+            return self.channels.values()
+
+        for channel in channels:
+            self.channels.set(channel["id"], channel)
+
+        self._channels_fresh_until = time.monotonic() + self._channels_ttl
+        logger.debug(f"Cached {len(channels)} channels")
+        return channels
+
+    async def fetch_users(self) -> None:
+        from slack_sdk.errors import SlackApiError
+
+        if self.client is None or self._users_disabled:
+            return
+
+        cursor = None
+        count = 0
+        try:
+            while True:
+                resp = await self.client.users_list(limit=200, cursor=cursor)
+                for member in resp["members"]:
+                    self.users.set(member["id"], profile(member))
+                    count += 1
+
+                cursor = resp.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        except SlackApiError as e:
+            self.user_lookup_failed(e)
+            return
+
+        logger.debug(f"Cached {count} users")
+
+    async def channel_list(self) -> list[Channel]:
+        if time.monotonic() < self._channels_fresh_until:
+            return self.channels.values()
+
+        return await self.fetch_channels()
+
+    def user_name(self, user_id: str | None) -> str | None:
+        """
+        The cached display name for a user, without ever calling the api. Safe to call from other threads.
+        """
+        if user_id is None:
+            return None
+
+        user = self.users.peek(user_id)
+        return user["name"] if user else user_id
+
+    async def user(self, user_id: str) -> dict | None:
+        if cached := self.users.get(user_id):
+            return cached
+
+        if self.client is None or self._users_disabled:
+            return None
+
+        if user_id in self._inflight:
+            return await self._inflight[user_id]
+
+        future: asyncio.Future[dict | None] = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            from slack_sdk.errors import SlackApiError
+            try:
+                resp = await self.client.users_info(user=user_id)
+                user = profile(resp["user"])
+                self.users.set(user_id, user)
+            except SlackApiError as e:
+                self.user_lookup_failed(e)
+                user = None
+            except Exception as e: # offline etc, anyone waiting on this lookup still needs an answer
+                logger.warning(f"Could not look up slack user {user_id}: {e}")
+                user = None
+
+            future.set_result(user)
+            return user
+        finally:
+            del self._inflight[user_id]
+
+    def user_lookup_failed(self, e: Exception) -> None:
+        error = e.response["error"]  # type: ignore
+        if error in ("missing_scope", "not_allowed_token_type"):
+            logger.warning("The slack app can't read users (needs users:read), requesters will show as user ids")
+            self._users_disabled = True
+        else:
+            logger.warning(f"Could not look up slack user: {error}")
+
+    # event driven invalidation
+
+    def on_channel_rename(self, event: dict) -> None:
+        channel = event["channel"]
+        self.channels.set(channel["id"], {"name": channel["name"], "id": channel["id"]})
+
+    def on_channel_gone(self, event: dict) -> None: # archived or deleted
+        channel = event["channel"]
+        self.channels.pop(channel if isinstance(channel, str) else channel["id"])
+
+    def on_user_change(self, event: dict) -> None:
+        user = event["user"]
+        self.users.set(user["id"], profile(user))
+
+
+def profile(member: dict) -> dict:
+    info = member.get("profile", {})
+    name = info.get("display_name") or info.get("real_name") or member.get("real_name") or member.get("name") or member["id"]
+    return {"id": member["id"], "name": name}
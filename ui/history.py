@@ -0,0 +1,76 @@
+from __future__ import annotations
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QHeaderView, QAbstractItemView
+import time
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .mainwindow import MainWindow
+    from history import Page
+
+CHUNK = 50
+
+
+class HistoryView(QWidget):
+    """
+    Page history, newest first. Loads a chunk at a time as you scroll instead of holding the whole history.
+    """
+    def __init__(self, main: MainWindow) -> None:
+        super().__init__()
+        self.main = main
+        self.oldest: float | None = None
+        self.exhausted = False
+
+        self._layout = QVBoxLayout()
+        self.setLayout(self._layout)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Number", "Queued", "Wait", "On Screen"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self._layout.addWidget(self.table)
+
+        self.refresh_button = QPushButton("Refresh")
+        self.refresh_button.clicked.connect(self.refresh)
+        self._layout.addWidget(self.refresh_button)
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self) -> None:
+        self.table.setRowCount(0)
+        self.oldest = None
+        self.exhausted = False
+        self.load_more()
+
+    def on_scroll(self, value: int) -> None:
+        if value >= self.table.verticalScrollBar().maximum():
+            self.load_more()
+
+    def load_more(self) -> None:
+        history = self.main.client.history
+        if history is None or self.exhausted:
+            return
+
+        pages = history.page_before(self.oldest, CHUNK)
+        if len(pages) < CHUNK:
+            self.exhausted = True
+
+        for page in pages:
+            self.add_row(page)
+
+        if pages:
+            self.oldest = pages[-1].queued_at
+
+    def add_row(self, page: Page) -> None:
+        def duration(start: float | None, end: float | None) -> str:
+            return f"{end - start:.0f}s" if start is not None and end is not None else "-"
+
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, QTableWidgetItem(page.number))
+        self.table.setItem(row, 1, QTableWidgetItem(time.strftime("%a %H:%M:%S", time.localtime(page.queued_at))))
+        self.table.setItem(row, 2, QTableWidgetItem(duration(page.queued_at, page.shown_at)))
+        self.table.setItem(row, 3, QTableWidgetItem(duration(page.shown_at, page.cleared_at)))
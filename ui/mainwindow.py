@@ -1,8 +1,9 @@
 import asyncio
 import threading
-from PySide6.QtWidgets import QMainWindow, QMessageBox, QApplication
+from PySide6.QtWidgets import QMainWindow, QMessageBox, QApplication, QTabWidget
 from PySide6.QtCore import Signal, SignalInstance
 
+from .history import HistoryView
 from .overview import Overview
 from .widget import WidgetMenu
 from bot import Client
@@ -19,8 +20,12 @@ class MainWindow(QMainWindow):
         
         self.widget = WidgetMenu(self, app)
         
+        self.tabs = QTabWidget()
         self.currentPage = Overview(self, self.widget)
-        self.setCentralWidget(self.currentPage)
+        self.tabs.addTab(self.currentPage, "Overview")
+        self.history = HistoryView(self)
+        self.tabs.addTab(self.history, "History")
+        self.setCentralWidget(self.tabs)
         self.setup_err_signal.connect(self.setup_err_alert)
     
     def setup_err_alert(self, text: str):
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, QStatusBar, QStyle, QCommandLinkButton
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, QStatusBar, QStyle, QCommandLinkButton, QComboBox
+from PySide6.QtCore import Qt, Signal, SignalInstance
 import threading
 import time
 
@@ -9,6 +9,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .widget import WidgetMenu
     from .mainwindow import MainWindow
+    from bot import Channel
 
 class Status(QWidget):
     def __init__(self, main: MainWindow) -> None:
@@ -27,12 +28,18 @@ class Status(QWidget):
         self.propresenter_status = QLabel("ProPres: Disconnected")
         self._status_bar.addPermanentWidget(self.propresenter_status)
 
+        self.lag_status = QLabel("Lag: N/A")
+        self._status_bar.addPermanentWidget(self.lag_status)
+
 
 class Overview(QWidget):
+    channels_signal: SignalInstance = Signal(list, name="channels") # type: ignore
+
     def __init__(self, main: MainWindow, widget: WidgetMenu) -> None:
         super().__init__()
         self.main = main
         self.widget: WidgetMenu = widget
+        self._channels: list[Channel] = []
 
         self._layout = QHBoxLayout()
         self.setLayout(self._layout)
@@ -54,43 +61,72 @@ class Overview(QWidget):
         self.status = Status(main)
         right.addWidget(self.status)
 
+        right.addWidget(QLabel("Listen Channel:"))
+        self.channel_picker = QComboBox()
+        self.channel_picker.setPlaceholderText("Waiting for Slack...")
+        self.channel_picker.activated.connect(self.pick_channel)
+        right.addWidget(self.channel_picker)
+        self.channels_signal.connect(self.set_channels)
+
         self._layout.addLayout(right)
 
         self.poll_thread = threading.Thread(target=self.poll_in_thread, name="Status Poll Thread", daemon=True)
         self.poll_thread.start()
 
+    def set_channels(self, channels: list[Channel]):
+        # runs on the qt thread, the poll thread sends the list through channels_signal
+        current = self.main.client.config["bot"].get("listen-channel")
+
+        self.channel_picker.blockSignals(True)
+        self.channel_picker.clear()
+        for channel in channels:
+            self.channel_picker.addItem(f"#{channel['name']}", channel["id"])
+
+        if current and self.channel_picker.findData(current) == -1:
+            self.channel_picker.addItem(current, current) # configured, but the bot can't see it
+
+        self.channel_picker.setCurrentIndex(self.channel_picker.findData(current))
+        self.channel_picker.blockSignals(False)
+
+    def pick_channel(self, index: int):
+        channel_id = self.channel_picker.itemData(index)
+        if not channel_id or channel_id == self.main.client.config["bot"].get("listen-channel"):
+            return
+
+        self.main.client.config["bot"]["listen-channel"] = channel_id
+        self.main.client.write_config()
+
     def poll_in_thread(self):
         time.sleep(2) # give the slack client a bit to set up
 
         while True:
             # first manage statuses
+            status = self.main.client.status()
 
-            try:
-                slack = self.main.client.handler.client
-                connected = (not slack.closed
-                    and not slack.stale
-                    and slack.current_session is not None
-                    and not slack.current_session.closed)
-            except:
-                connected = False
-                        
-            if connected:
+            if status["slack"]:
                 self.status.slack_status.setText("Slack: Connected")
                 self.widget.slack_status.setText("Slack: Connected")
             else:
                 self.status.slack_status.setText("Slack: Disconnected")
                 self.widget.slack_status.setText("Slack: Disconnected")
 
-            propres = self.main.client
-            connected = (propres.prop_ws is not None and not propres.prop_ws.closed and propres.prop_authenticated)
-
-            if connected:
+            if status["leader"] is False:
+                self.status.propresenter_status.setText("ProPres: Standby")
+                self.widget.propres_status.setText("Propresenter: Standby")
+            elif status["propresenter"]:
                 self.status.propresenter_status.setText("ProPres: Connected")
                 self.widget.propres_status.setText("Propresenter: Connected")
             else:
                 self.status.propresenter_status.setText("ProPres: Disconnected")
                 self.widget.propres_status.setText("Propresenter: Disconnected")
 
+            monitor = self.main.client.monitor
+            if monitor is not None:
+                lag = monitor.lag * 1000
+                self.status.lag_status.setText(f"Lag: {lag:.0f}ms")
+                self.status.lag_status.setToolTip(f"Event loop lag: {lag:.1f}ms\nTasks: {monitor.task_count} ({monitor.client_task_count} tracked)")
+                self.status.lag_status.setStyleSheet("color: red" if monitor.lag >= monitor.slow_callback else "")
+
             # then manage active numbers
             txt = ""
             if self.main.client.last_number:
@@ -110,19 +146,19 @@ class Overview(QWidget):
                 self.widget.queue.setText("Active Number: N/A")
                 txt += "Active Number: N/A"
             
+            if any(status["active_by"]):
+                txt += f"\nRequested by: {', '.join(name for name in status['active_by'] if name)}"
+
             self.active.setText(txt.strip())
+
+            # channels come from the slack metadata cache, never straight from the api
+            channels = sorted(self.main.client.slack_cache.channels.values(), key=lambda c: c["name"])
+            if channels != self._channels:
+                self._channels = channels
+                self.channels_signal.emit(channels)
             
             # then queued numbers:
-            try:
-                queue: list[tuple[tuple[str, str], ...]] = list(self.main.client.number_queue._queue) # type: ignore
-            except AttributeError:
-                queue = []
-            
-            if self.main.client.current_batch:
-                queue.append(tuple(self.main.client.current_batch))
-
-            numbers = [self.main.client.process_number_batch(batch)[0] for batch in queue]
-            formatted = "\n".join(numbers)
+            formatted = "\n".join(status["queued"])
             self.queue.setText(f"Numbers Queued:\n{formatted}")
             
             time.sleep(1)